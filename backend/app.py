@@ -3,17 +3,49 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
 from apscheduler.schedulers.background import BackgroundScheduler
 import os
 from dotenv import load_dotenv
 from db import db
+from utils.json_provider import JSONProvider
+from utils.db_pool import engine_options, init_db_pool
+from utils.read_replicas import init_read_replicas
+from utils.ttl_store import check_redis_client
 
 load_dotenv()
 
 app = Flask(__name__)
+# orjson-backed JSON responses when orjson is installed (see utils/json_provider.py)
+app.json = JSONProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = False  # Tokens don't expire for simplicity
+# 'database' keeps login OTPs in pending_logins; 'stateless' uses signed challenges
+app.config['LOGIN_OTP_MODE'] = os.getenv('LOGIN_OTP_MODE', 'database')
+# Optional Redis for state shared across workers (e.g. used OTP challenge nonces)
+app.config['REDIS_URL'] = os.getenv('REDIS_URL', '')
+check_redis_client(app.config['REDIS_URL'])
+# Seconds to wait on Redis before treating it as down
+app.config['REDIS_SOCKET_TIMEOUT'] = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.25))
+# Password hashing (see utils/password_hashing.py); hashes made with other
+# parameters are upgraded on the user's next login
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+# Token-bucket limits on the auth endpoints (see utils/rate_limit.py), shared
+# across workers through REDIS_URL when set
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+# Background jobs (auto-reject, email outbox, auth row purge) run in every
+# gunicorn worker, with a database lease picking one runner per job. Turn off
+# to run them in a separate process instead.
+app.config['SCHEDULER_ENABLED'] = os.getenv('SCHEDULER_ENABLED', 'True').lower() == 'true'
+# /metrics is served to requests with METRICS_TOKEN as a bearer token or
+# from an address in METRICS_ALLOWED_IPS (comma-separated IPs/CIDRs)
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+app.config['METRICS_ALLOWED_IPS'] = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.0/8,::1')
+# X-Query-Count / X-Query-Time-Ms / X-Query-Repeated response headers; always on in debug
+app.config['QUERY_STATS_HEADERS'] = os.getenv('QUERY_STATS_HEADERS', 'False').lower() == 'true'
 # Use SQLite for development if DATABASE_URL is not set
 # Railway provides PostgreSQL via DATABASE_URL (postgres://...)
 # For MySQL, use mysql+pymysql://... format
@@ -22,11 +54,25 @@ database_url = os.getenv('DATABASE_URL', default_db)
 
 # Handle Railway's PostgreSQL URL (postgres:// -> postgresql://)
 # SQLAlchemy requires postgresql:// but Railway provides postgres://
-if database_url.startswith('postgres://'):
-    database_url = database_url.replace('postgres://', 'postgresql://', 1)
+def normalize_database_url(url):
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+database_url = normalize_database_url(database_url)
+# Optional read replicas, comma-separated; replica_read GET handlers query them
+# (see utils/read_replicas.py)
+replica_urls = [normalize_database_url(url.strip()) for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Seconds a user's reads stay on the primary after their own write
+app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 10))
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool size, overflow, timeout, recycle and pre-ping from DB_POOL_PROFILE
+# and DB_POOL_* overrides (see utils/db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+# Connections each gunicorn worker opens on boot; defaults to the pool size
+app.config['DB_POOL_WARM'] = int(os.getenv('DB_POOL_WARM', app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_size', 0)))
 
 # Email configuration
 app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -34,6 +80,9 @@ app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
 app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME', '')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD', '')
+# Authenticated SMTP sessions kept open for reuse (see utils/mail_transport.py)
+app.config['MAIL_POOL_SIZE'] = int(os.getenv('MAIL_POOL_SIZE', 2))
+app.config['MAIL_POOL_MAX_IDLE'] = int(os.getenv('MAIL_POOL_MAX_IDLE', 30))
 
 # Print email configuration on startup (for debugging)
 if app.config['MAIL_USERNAME']:
@@ -41,8 +90,16 @@ if app.config['MAIL_USERNAME']:
 else:
     print("Warning: Email not configured (MAIL_USERNAME not set)")
 
+# Behind a load balancer, trust that many X-Forwarded-For hops so
+# request.remote_addr (and the per-IP rate limits) see the real client
+trusted_proxies = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
 # Initialize extensions
 db.init_app(app)
+init_db_pool(app, db)
+init_read_replicas(app, db, replica_urls)
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
 # CORS configuration
@@ -82,7 +139,7 @@ def missing_token_callback(error):
     return jsonify({'error': 'Authorization token is missing'}), 401
 
 # Import models after db is initialized
-from models import User, Loan, Profile, PendingRegistration, PendingLogin, PasswordReset
+from models import User, Loan, Profile, PendingRegistration, PendingLogin, PasswordReset, SchedulerLease, JobRun, EmailOutbox, CacheVersion
 
 # Import routes
 from routes.auth import auth_bp
@@ -95,12 +152,24 @@ app.register_blueprint(loans_bp, url_prefix='/api/loans')
 app.register_blueprint(profile_bp, url_prefix='/api/profile')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+# Per-request SQL statement counts (X-Query-* headers in debug), then
+# request latency, status and query-count metrics at /metrics
+from utils.query_counter import init_query_counter
+from utils.metrics import init_metrics
+init_query_counter(app)
+init_metrics(app)
+
 # Import scheduler tasks
-from scheduler import init_scheduler
+from scheduler import init_scheduler, start_scheduler, run_scheduler
 
 # Initialize scheduler
 scheduler = init_scheduler(app, db)
 
+@app.cli.command('run-scheduler')
+def run_scheduler_command():
+    """Run the background jobs in this process (pair with SCHEDULER_ENABLED=false on the web workers)"""
+    run_scheduler(app, db)
+
 # Root route - API information
 @app.route('/')
 def index():
@@ -127,15 +196,20 @@ def index():
                 'POST /api/profile': 'Create/update profile (requires JWT)'
             },
             'loans': {
-                'GET /api/loans': 'Get all loans (requires JWT)',
+                'GET /api/loans': 'Get all loans (requires JWT, optional ?limit=&cursor=)',
                 'POST /api/loans': 'Create loan application (requires JWT)',
                 'GET /api/loans/<id>': 'Get specific loan (requires JWT)'
             },
             'admin': {
-                'GET /api/admin/loans/pending': 'Get pending loans (admin only)',
+                'GET /api/admin/loans/pending': 'Get pending loans (admin only, optional ?limit=&cursor=)',
                 'POST /api/admin/loans/<id>/approve': 'Approve loan (admin only)',
                 'POST /api/admin/loans/<id>/reject': 'Reject loan (admin only)',
+                'POST /api/admin/loans/bulk-decision': 'Approve/reject many loans at once (admin only)',
+                'GET /api/admin/loans/export': 'Stream loans as NDJSON or CSV (admin only, ?format=ndjson|csv&status=&from=&to=)',
                 'GET /api/admin/rejection-reasons': 'Get rejection reason codes (admin only)'
+            },
+            'monitoring': {
+                'GET /metrics': 'Prometheus metrics'
             }
         },
         'status': 'running'
@@ -144,7 +218,7 @@ def index():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    scheduler.start()
+    start_scheduler(app, scheduler)
     # Get port from environment variable (for production deployments like Render, Railway)
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
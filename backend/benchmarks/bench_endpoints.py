@@ -0,0 +1,208 @@
+"""Endpoint benchmarks over a large synthetic dataset
+
+Seeds a throwaway database, drives the hot endpoints through the Flask test
+client and writes p50/p95/p99 latency, SQL statements per request and peak
+RSS for each scenario as JSON.
+
+    # Full-size run (100k users, 1M loans) saved as the baseline
+    python -m benchmarks.bench_endpoints --output baseline.json
+
+    # Later: re-run and flag regressions against it
+    python -m benchmarks.bench_endpoints --output current.json --compare baseline.json
+
+Run from the backend directory. DATABASE_URL is overridden with a temporary
+SQLite file unless --database-url is given.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from utils.query_counter import track_queries
+
+PASSWORD = 'benchmark123'
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot API endpoints')
+    parser.add_argument('--users', type=int, default=100000, help='Number of users to seed')
+    parser.add_argument('--loans', type=int, default=1000000, help='Number of loans to seed')
+    parser.add_argument('--iterations', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--database-url', help='Database to seed and benchmark (default: temporary SQLite file)')
+    parser.add_argument('--output', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--compare', help='Baseline results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative p95 slowdown before flagging a regression (default 0.2 = 20%%)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    return parser.parse_args(argv)
+
+def seed(db, users, loans, seed):
+    """Create a benchmark admin and bulk-generate the dataset; returns (admin id, one borrower id)"""
+    from werkzeug.security import generate_password_hash
+    from models import User
+    from seed_data import bulk_seed
+
+    admin = User(username='bench_admin', email='bench_admin@example.com', role='admin',
+                 password_hash=generate_password_hash(PASSWORD))
+    db.session.add(admin)
+    db.session.commit()
+
+    # Loans spread over 30 days so the pending queue has both fresh and stale rows
+    bulk_seed(users, loans, days=30, seed=seed)
+
+    borrower = User.query.filter(User.role == 'user').order_by(User.id).first()
+    return admin.id, borrower.id
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def run_scenario(db, name, iterations, request_fn):
+    """Call request_fn(i) iterations times; each call returns a Flask test response"""
+    latencies = []
+    statuses = {}
+
+    # Counted the same way as the per-request metrics and test query budgets
+    with track_queries() as counter:
+        for i in range(iterations):
+            started = time.perf_counter()
+            response = request_fn(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            # Each request gets a fresh identity map, as in production
+            db.session.remove()
+
+    latencies.sort()
+    result = {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries_per_request': round(counter.count / iterations, 2),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'peak_rss_mb': peak_rss_mb()
+    }
+    print(f"{name}: p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+          f"queries/request={result['queries_per_request']}", file=sys.stderr)
+    return result
+
+def run_benchmarks(args):
+    from app import app
+    from db import db
+    from models import Loan, User
+    from scheduler import auto_reject_old_loans
+    from utils.auth_tokens import create_user_token
+
+    results = {}
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        started = time.perf_counter()
+        admin_id, borrower_id = seed(db, args.users, args.loans, args.seed)
+        seed_seconds = time.perf_counter() - started
+        print(f"Seeded {args.users} users and {args.loans} loans in {seed_seconds:.1f}s", file=sys.stderr)
+
+        admin_headers = {'Authorization': f'Bearer {create_user_token(User.query.get(admin_id))}'}
+        borrower_headers = {'Authorization': f'Bearer {create_user_token(User.query.get(borrower_id))}'}
+        pending_ids = [row.id for row in db.session.query(Loan.id).filter(
+            Loan.status == Loan.PENDING
+        ).order_by(Loan.created_at.desc()).limit(2 * args.iterations)]
+        db.session.remove()
+
+        client = app.test_client()
+        iterations = args.iterations
+
+        results['admin_list_loans'] = run_scenario(db, 'admin_list_loans', iterations, lambda i: client.get(
+            '/api/loans?limit=50', headers=admin_headers))
+        results['user_list_loans'] = run_scenario(db, 'user_list_loans', iterations, lambda i: client.get(
+            '/api/loans', headers=borrower_headers))
+        results['admin_pending_queue'] = run_scenario(db, 'admin_pending_queue', iterations, lambda i: client.get(
+            '/api/admin/loans/pending?limit=50', headers=admin_headers))
+
+        approve_ids = pending_ids[0::2]
+        reject_ids = pending_ids[1::2]
+        results['approve_loan'] = run_scenario(db, 'approve_loan', min(iterations, len(approve_ids)), lambda i: client.post(
+            f'/api/admin/loans/{approve_ids[i]}/approve', headers=admin_headers, json={'admin_notes': 'Benchmark'}))
+        results['reject_loan'] = run_scenario(db, 'reject_loan', min(iterations, len(reject_ids)), lambda i: client.post(
+            f'/api/admin/loans/{reject_ids[i]}/reject', headers=admin_headers,
+            json={'rejection_reason': Loan.REASON_INSUFFICIENT_INCOME}))
+        results['create_loan'] = run_scenario(db, 'create_loan', iterations, lambda i: client.post(
+            '/api/loans', headers=borrower_headers, json={'amount': 1000 + i, 'purpose': 'Benchmark loan'}))
+
+        with track_queries() as counter:
+            started = time.perf_counter()
+            rejected = auto_reject_old_loans(app)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        results['auto_reject_old_loans'] = {
+            'iterations': 1,
+            'p50_ms': round(elapsed_ms, 3),
+            'p95_ms': round(elapsed_ms, 3),
+            'p99_ms': round(elapsed_ms, 3),
+            'queries_per_request': counter.count,
+            'rows_affected': rejected,
+            'peak_rss_mb': peak_rss_mb()
+        }
+        print(f"auto_reject_old_loans: {elapsed_ms:.1f}ms for {rejected} loans", file=sys.stderr)
+
+    return {
+        'dataset': {'users': args.users, 'loans': args.loans, 'seed': args.seed, 'seed_seconds': round(seed_seconds, 1)},
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://', 1)[0],
+        'created_at': datetime.utcnow().isoformat(),
+        'scenarios': results
+    }
+
+def compare(current, baseline, threshold):
+    """Return a list of human-readable regressions of current against baseline"""
+    regressions = []
+    for name, base in baseline['scenarios'].items():
+        now = current['scenarios'].get(name)
+        if now is None:
+            continue
+        if base['p95_ms'] and now['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now['queries_per_request'] > base['queries_per_request']:
+            regressions.append(f"{name}: queries/request {base['queries_per_request']} -> {now['queries_per_request']}")
+    return regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_file = os.path.join(tempfile.mkdtemp(prefix='lms-bench-'), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    results = run_benchmarks(args)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        results['regressions'] = compare(results, baseline, args.threshold)
+        for regression in results['regressions']:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        exit_code = 1 if results['regressions'] else 0
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""JSON serialization benchmark for admin-sized loan payloads
+
+Builds in-memory loans (no database) and times, for each JSON backend,
+Loan.to_dict() over the list and the dump of the resulting payload:
+
+    python -m benchmarks.bench_serialization --rows 10000
+
+Run from the backend directory. The orjson backend is skipped if orjson is
+not installed.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark JSON serialization of loan lists')
+    parser.add_argument('--rows', type=int, default=10000, help='Loans per payload')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed runs per backend')
+    parser.add_argument('--output', help='Write results JSON here (default: stdout)')
+    return parser.parse_args(argv)
+
+def build_loans(rows):
+    """Transient loans, each with its owning user, shaped like the admin list"""
+    from models import Loan, User
+
+    now = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    users = [User(id=i, username=f'user{i}', email=f'user{i}@example.com', role='user',
+                  profile_completed=True, created_at=now) for i in range(1, 101)]
+    loans = []
+    for i in range(rows):
+        user = users[i % len(users)]
+        loans.append(Loan(
+            id=i + 1, user_id=user.id, user=user, amount=1000 + i, purpose=f'Loan purpose {i}',
+            status=Loan.PENDING, admin_notes='', created_at=now - timedelta(minutes=i),
+            updated_at=now - timedelta(minutes=i)
+        ))
+    return loans
+
+def time_backend(provider, loans, iterations):
+    to_dict_ms = []
+    dumps_ms = []
+    size = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        payload = {'loans': [loan.to_dict() for loan in loans], 'next_cursor': None}
+        to_dict_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        body = provider.response(payload).get_data()
+        dumps_ms.append((time.perf_counter() - started) * 1000)
+        size = len(body)
+
+    to_dict_ms.sort()
+    dumps_ms.sort()
+    return {
+        'to_dict_median_ms': round(to_dict_ms[len(to_dict_ms) // 2], 3),
+        'dumps_median_ms': round(dumps_ms[len(dumps_ms) // 2], 3),
+        'body_bytes': size
+    }
+
+def run_benchmarks(args):
+    from app import app
+    from utils.json_provider import OrjsonJSONProvider, StdlibJSONProvider, orjson
+
+    backends = {'stdlib': StdlibJSONProvider(app)}
+    if orjson is not None:
+        backends['orjson'] = OrjsonJSONProvider(app)
+    else:
+        print('orjson not installed; only timing the stdlib backend', file=sys.stderr)
+
+    results = {}
+    with app.app_context():
+        loans = build_loans(args.rows)
+        for name, provider in backends.items():
+            results[name] = time_backend(provider, loans, args.iterations)
+            print(f"{name}: to_dict={results[name]['to_dict_median_ms']}ms "
+                  f"dumps={results[name]['dumps_median_ms']}ms", file=sys.stderr)
+
+    return {'rows': args.rows, 'iterations': args.iterations, 'backends': results}
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = json.dumps(run_benchmarks(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
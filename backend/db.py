@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from utils.read_replicas import RoutingSession
 
-db = SQLAlchemy()
-
+# RoutingSession sends replica_read handlers' reads to DATABASE_REPLICA_URLS
+db = SQLAlchemy(session_options={'class_': RoutingSession})
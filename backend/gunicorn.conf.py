@@ -0,0 +1,45 @@
+# Loaded automatically by gunicorn from the working directory
+import os
+import shutil
+
+# Workers share metrics through files in this directory (prometheus_client
+# multiprocess mode). Must be set before the app imports prometheus_client.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/lms-prometheus')
+
+# Threads per worker (gthread). Password hashing runs on a bounded pool that
+# releases the GIL (utils/password_hashing.py), so a login burst only takes
+# PASSWORD_HASH_WORKERS cores per worker and the other threads keep serving.
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+def on_starting(server):
+    # Drop samples left over from a previous run of the master
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Without Redis, used login challenges, OTP attempt counts and rate
+    # limits are kept per worker, so each worker enforces them separately
+    if server.cfg.workers > 1 and not os.getenv('REDIS_URL'):
+        print(f"Warning: {server.cfg.workers} workers without REDIS_URL; a used login OTP challenge "
+              "can be replayed once per worker and OTP attempt and rate limits are per worker. "
+              "Set REDIS_URL to share them.")
+
+def post_worker_init(worker):
+    # Runs in each worker once it has imported the app, so the first
+    # requests don't wait for database connections to be opened
+    from app import app, scheduler as app_scheduler
+    from db import db
+    from scheduler import start_scheduler
+    from utils.db_pool import warm_pools
+    warm_pools(app, db)
+    # Background jobs: every worker runs a scheduler and the database lease
+    # (scheduler.run_singleton_job) lets one of them run each job. Scheduler
+    # threads don't survive a fork, so this can't happen in the master.
+    start_scheduler(app, app_scheduler)
+
+def worker_exit(server, worker):
+    from app import scheduler as app_scheduler
+    if app_scheduler.running:
+        app_scheduler.shutdown(wait=False)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -38,7 +38,7 @@ def get_engine_url():
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from models import User, Profile, Loan, PendingRegistration  # noqa
+from models import User, Profile, Loan, PendingRegistration, SchedulerLease, JobRun, EmailOutbox, CacheVersion  # noqa
 
 config.set_main_option('sqlalchemy.url', get_engine_url())
 target_db = current_app.extensions['migrate'].db
@@ -0,0 +1,69 @@
+"""index auth lookups and hash reset tokens
+
+Revision ID: 4f7a2c9e1b36
+Revises: 9d3b6f2a8c51
+Create Date: 2026-10-17 15:12:44.905183
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f7a2c9e1b36'
+down_revision = '9d3b6f2a8c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_pending_registrations_email', 'pending_registrations', ['email'], unique=False)
+    op.create_index('ix_pending_registrations_otp_expires_at', 'pending_registrations', ['otp_expires_at'], unique=False)
+    op.create_index('ix_pending_logins_user_id', 'pending_logins', ['user_id'], unique=False)
+    op.create_index('ix_pending_logins_otp_expires_at', 'pending_logins', ['otp_expires_at'], unique=False)
+    op.create_index('ix_password_resets_user_id', 'password_resets', ['user_id'], unique=False)
+    op.create_index('ix_password_resets_email', 'password_resets', ['email'], unique=False)
+    op.create_index('ix_password_resets_otp_expires_at', 'password_resets', ['otp_expires_at'], unique=False)
+
+    with op.batch_alter_table('password_resets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reset_token_hash', sa.String(length=64), nullable=True))
+
+    # Hash outstanding tokens so in-flight resets keep working
+    conn = op.get_bind()
+    password_resets = sa.table(
+        'password_resets',
+        sa.column('id', sa.Integer),
+        sa.column('reset_token', sa.String),
+        sa.column('reset_token_hash', sa.String)
+    )
+    rows = conn.execute(
+        sa.select(password_resets.c.id, password_resets.c.reset_token).where(password_resets.c.reset_token.isnot(None))
+    ).fetchall()
+    for row_id, reset_token in rows:
+        conn.execute(
+            password_resets.update().where(password_resets.c.id == row_id).values(
+                reset_token_hash=hashlib.sha256(reset_token.encode('utf-8')).hexdigest()
+            )
+        )
+
+    with op.batch_alter_table('password_resets', schema=None) as batch_op:
+        batch_op.create_index('ix_password_resets_reset_token_hash', ['reset_token_hash'], unique=True)
+        batch_op.drop_column('reset_token')
+
+
+def downgrade():
+    # Plaintext tokens can't be recovered; outstanding resets must be restarted
+    with op.batch_alter_table('password_resets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reset_token', sa.String(length=255), nullable=True))
+        batch_op.drop_index('ix_password_resets_reset_token_hash')
+        batch_op.drop_column('reset_token_hash')
+
+    op.drop_index('ix_password_resets_otp_expires_at', table_name='password_resets')
+    op.drop_index('ix_password_resets_email', table_name='password_resets')
+    op.drop_index('ix_password_resets_user_id', table_name='password_resets')
+    op.drop_index('ix_pending_logins_otp_expires_at', table_name='pending_logins')
+    op.drop_index('ix_pending_logins_user_id', table_name='pending_logins')
+    op.drop_index('ix_pending_registrations_otp_expires_at', table_name='pending_registrations')
+    op.drop_index('ix_pending_registrations_email', table_name='pending_registrations')
@@ -0,0 +1,28 @@
+"""add email outbox claims
+
+Revision ID: 6a2f8d1c4e79
+Revises: b81e5d3c9f24
+Create Date: 2026-10-17 18:42:31.870214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2f8d1c4e79'
+down_revision = 'b81e5d3c9f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_column('claim_token')
+        batch_op.drop_column('claimed_at')
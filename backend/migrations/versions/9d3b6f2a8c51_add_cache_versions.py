@@ -0,0 +1,29 @@
+"""add cache versions
+
+Revision ID: 9d3b6f2a8c51
+Revises: e2a96b7c4d13
+Create Date: 2026-10-17 14:05:37.640219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b6f2a8c51'
+down_revision = 'e2a96b7c4d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,31 @@
+"""add loan hot path indexes
+
+Revision ID: a3f1c9d2e7b4
+Revises: 1e4b7a0c2d95
+Create Date: 2026-10-17 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = '1e4b7a0c2d95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Pending queue and auto-rejection: status = ? [AND created_at <= ?] ORDER BY created_at
+    op.create_index('ix_loans_status_created_at', 'loans', ['status', 'created_at'], unique=False)
+    # Borrower's own loans: user_id = ? ORDER BY created_at DESC
+    op.create_index('ix_loans_user_id_created_at', 'loans', ['user_id', 'created_at'], unique=False)
+    # Admin list of every loan: ORDER BY created_at DESC, id DESC
+    op.create_index('ix_loans_created_at_id', 'loans', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_loans_created_at_id', table_name='loans')
+    op.drop_index('ix_loans_user_id_created_at', table_name='loans')
+    op.drop_index('ix_loans_status_created_at', table_name='loans')
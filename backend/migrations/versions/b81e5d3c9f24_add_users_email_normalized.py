@@ -0,0 +1,55 @@
+"""add users email normalized
+
+Revision ID: b81e5d3c9f24
+Revises: 4f7a2c9e1b36
+Create Date: 2026-10-17 15:58:09.316482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e5d3c9f24'
+down_revision = '4f7a2c9e1b36'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=120), nullable=True))
+
+    # Backfill in Python rather than with SQL lower()/trim() so existing rows
+    # match models.normalize_email exactly (SQLite's lower() is ASCII-only)
+    conn = op.get_bind()
+    users = sa.table(
+        'users',
+        sa.column('id', sa.Integer),
+        sa.column('email', sa.String),
+        sa.column('email_normalized', sa.String)
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(users.c.id, users.c.email).where(users.c.id > last_id).order_by(users.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            users.update().where(users.c.id == sa.bindparam('user_id')).values(email_normalized=sa.bindparam('normalized')),
+            [{'user_id': row_id, 'normalized': email.strip().lower()} for row_id, email in rows]
+        )
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('email_normalized', existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index('ix_users_email_normalized', ['email_normalized'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_email_normalized')
+        batch_op.drop_column('email_normalized')
@@ -0,0 +1,26 @@
+"""add users token version
+
+Revision ID: e2a96b7c4d13
+Revises: c7d41e9a3b85
+Create Date: 2026-10-17 12:40:52.118630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a96b7c4d13'
+down_revision = 'c7d41e9a3b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
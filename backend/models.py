@@ -1,29 +1,44 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from sqlalchemy.orm import validates
 from db import db
+from utils.password_hashing import get_password_hasher
+import hashlib
 import random
 import string
 
+def normalize_email(email):
+    """Canonical form of an email address for storage and lookups"""
+    return email.strip().lower() if email else email
+
 class User(db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    # normalize_email(email), kept in sync on assignment; every lookup by email uses it
+    email_normalized = db.Column(db.String(120), nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='user', nullable=False)  # 'user' or 'admin'
     profile_completed = db.Column(db.Boolean, default=False, nullable=False)
+    # Bumped to revoke every JWT issued so far (tokens carry it as the 'tv' claim)
+    token_version = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     profile = db.relationship('Profile', backref='user', uselist=False, cascade='all, delete-orphan')
     loans = db.relationship('Loan', foreign_keys='Loan.user_id', backref='user', lazy=True, cascade='all, delete-orphan')
     
+    @validates('email')
+    def _sync_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+    
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
     
     def to_dict(self):
         return {
@@ -67,6 +82,12 @@ class Profile(db.Model):
 
 class Loan(db.Model):
     __tablename__ = 'loans'
+    # Keep in sync with migrations/versions/a3f1c9d2e7b4_add_loan_hot_path_indexes.py
+    __table_args__ = (
+        db.Index('ix_loans_status_created_at', 'status', 'created_at'),
+        db.Index('ix_loans_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_loans_created_at_id', 'created_at', 'id'),
+    )
     
     # Status options
     PENDING = 'pending'
@@ -94,8 +115,13 @@ class Loan(db.Model):
     
     reviewer = db.relationship('User', foreign_keys=[reviewed_by], backref='reviewed_loans')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_user=True):
+        """Serialize the loan, optionally embedding the owning user.
+
+        List endpoints that embed the user should eager-load Loan.user
+        (see routes) so this doesn't trigger one SELECT per loan.
+        """
+        data = {
             'id': self.id,
             'user_id': self.user_id,
             'amount': float(self.amount),
@@ -106,9 +132,11 @@ class Loan(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
-            'reviewed_by': self.reviewed_by,
-            'user': self.user.to_dict() if self.user else None
+            'reviewed_by': self.reviewed_by
         }
+        if include_user:
+            data['user'] = self.user.to_dict() if self.user else None
+        return data
 
 class PendingRegistration(db.Model):
     """Stores pending registration data until OTP is verified"""
@@ -116,11 +144,11 @@ class PendingRegistration(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
-    email = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default='user', nullable=False)
     otp = db.Column(db.String(6), nullable=False)
-    otp_expires_at = db.Column(db.DateTime, nullable=False)
+    otp_expires_at = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def generate_otp(self):
@@ -149,10 +177,10 @@ class PendingLogin(db.Model):
     __tablename__ = 'pending_logins'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     email = db.Column(db.String(120), nullable=False)
     otp = db.Column(db.String(6), nullable=False)
-    otp_expires_at = db.Column(db.DateTime, nullable=False)
+    otp_expires_at = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='pending_logins')
@@ -182,13 +210,14 @@ class PasswordReset(db.Model):
     __tablename__ = 'password_resets'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    email = db.Column(db.String(120), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    email = db.Column(db.String(120), nullable=False, index=True)
     otp = db.Column(db.String(6), nullable=False)
-    otp_expires_at = db.Column(db.DateTime, nullable=False)
+    otp_expires_at = db.Column(db.DateTime, nullable=False, index=True)
     otp_attempts = db.Column(db.Integer, default=0, nullable=False)
     max_otp_attempts = db.Column(db.Integer, default=5, nullable=False)
-    reset_token = db.Column(db.String(255), nullable=True)
+    # SHA-256 of the reset token; the token itself is only ever sent to the user
+    reset_token_hash = db.Column(db.String(64), nullable=True, unique=True, index=True)
     reset_token_expires_at = db.Column(db.DateTime, nullable=True)
     reset_token_used = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -214,17 +243,23 @@ class PasswordReset(db.Model):
         """Increment OTP verification attempts"""
         self.otp_attempts += 1
     
+    @staticmethod
+    def hash_reset_token(reset_token):
+        """Hash under which a reset token is stored and looked up"""
+        return hashlib.sha256(reset_token.encode('utf-8')).hexdigest()
+    
     def generate_reset_token(self):
-        """Generate a reset token (UUID-like string)"""
+        """Generate a reset token (UUID-like string); only its hash is stored"""
         import uuid
-        self.reset_token = str(uuid.uuid4()).replace('-', '')
+        reset_token = str(uuid.uuid4()).replace('-', '')
+        self.reset_token_hash = self.hash_reset_token(reset_token)
         self.reset_token_expires_at = datetime.utcnow() + timedelta(minutes=15)  # Reset token expires in 15 minutes
         self.reset_token_used = False
-        return self.reset_token
+        return reset_token
     
     def is_reset_token_valid(self):
         """Check if reset token is valid and not expired or used"""
-        if not self.reset_token:
+        if not self.reset_token_hash:
             return False
         if self.reset_token_used:
             return False
@@ -246,3 +281,108 @@ class PasswordReset(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class SchedulerLease(db.Model):
+    """Lease that elects the single process allowed to run a scheduled job"""
+    __tablename__ = 'scheduler_leases'
+    
+    job_id = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'holder': self.holder,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class JobRun(db.Model):
+    """Record of one execution of a scheduled job"""
+    __tablename__ = 'job_runs'
+    
+    # Status options
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False, index=True)
+    holder = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default=RUNNING, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    rows_affected = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'holder': self.holder,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'rows_affected': self.rows_affected,
+            'error': self.error
+        }
+
+class EmailOutbox(db.Model):
+    """Email queued in the same transaction as the change that triggered it"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    # Status options
+    PENDING = 'pending'
+    SENDING = 'sending'  # Claimed by a dispatcher (claim_token) and being sent
+    SENT = 'sent'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'  # Email not configured when the dispatcher picked it up
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default=PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'claimed_at': self.claimed_at.isoformat() if self.claimed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class CacheVersion(db.Model):
+    """Version counter for a cached payload, bumped right after the writes it covers commit"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
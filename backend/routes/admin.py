@@ -1,31 +1,43 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import User, Loan
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from models import Loan
 from db import db
-from datetime import datetime
-from utils.email_service import send_loan_notification
+from datetime import datetime, timedelta
+import csv
+import io
+from sqlalchemy import case
+from sqlalchemy.orm import joinedload
+from utils.email_outbox import queue_loan_notification
+from utils.loan_queries import loan_row_to_dict, select_loans
+from utils.pagination import get_page_args, paginate_keyset
+from utils.auth_tokens import require_role, get_token_identity
+from utils.read_replicas import replica_read
+from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version, get_cache_version, get_response_cache
 
 admin_bp = Blueprint('admin', __name__)
 
-def require_admin():
-    """Decorator to require admin role"""
-    user_id = get_jwt_identity()
-    # Convert string ID back to integer for database query
-    user = User.query.get(int(user_id))
-    if not user or user.role != 'admin':
-        return jsonify({'error': 'Admin access required'}), 403
-    return None
+# Rows fetched per round trip by the export's server-side cursor
+EXPORT_BATCH_SIZE = 1000
+# Bulk decisions: items accepted per request, and loans updated per transaction
+BULK_DECISION_MAX_ITEMS = 5000
+BULK_DECISION_CHUNK_SIZE = 500
+
+VALID_REJECTION_REASONS = [
+    Loan.REASON_INSUFFICIENT_INCOME,
+    Loan.REASON_POOR_CREDIT_HISTORY,
+    Loan.REASON_INCOMPLETE_DOCUMENTATION,
+    Loan.REASON_EXCEEDS_LIMIT
+]
+
+EXPORT_CSV_COLUMNS = [
+    'id', 'user_id', 'username', 'email', 'amount', 'purpose', 'status', 'rejection_reason',
+    'admin_notes', 'created_at', 'updated_at', 'reviewed_at', 'reviewed_by'
+]
 
 @admin_bp.route('/loans/<int:loan_id>/approve', methods=['POST'])
-@jwt_required()
+@require_role('admin')
 def approve_loan(loan_id):
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
-        
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        admin_id = get_token_identity().id
         
         loan = Loan.query.get(loan_id)
         
@@ -40,22 +52,19 @@ def approve_loan(loan_id):
         # Update loan status
         loan.status = Loan.APPROVED
         loan.reviewed_at = datetime.utcnow()
-        loan.reviewed_by = int(user_id)
+        loan.reviewed_by = admin_id
         loan.admin_notes = data.get('admin_notes', '')
         loan.rejection_reason = None
         
-        db.session.commit()
+        # Queue the email notification in the same transaction as the decision;
+        # the outbox dispatcher sends it in the background
+        queue_loan_notification(loan, 'approved')
+        bump_cache_version(PENDING_LOANS_CACHE)
         
-        # Send email notification to user
-        try:
-            send_loan_notification(loan, 'approved')
-            print(f"Approval email sent successfully to {loan.user.email}")
-        except Exception as e:
-            print(f"Failed to send approval email notification: {e}")
-            # Don't fail the request if email fails, just log the error
+        db.session.commit()
         
         return jsonify({
-            'message': 'Loan approved successfully. Email notification sent to user.',
+            'message': 'Loan approved successfully. Email notification queued for user.',
             'loan': loan.to_dict()
         }), 200
     
@@ -64,15 +73,10 @@ def approve_loan(loan_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/loans/<int:loan_id>/reject', methods=['POST'])
-@jwt_required()
+@require_role('admin')
 def reject_loan(loan_id):
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
-        
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        admin_id = get_token_identity().id
         
         loan = Loan.query.get(loan_id)
         
@@ -88,35 +92,24 @@ def reject_loan(loan_id):
             return jsonify({'error': 'Rejection reason is required'}), 400
         
         # Validate rejection reason code
-        valid_reasons = [
-            Loan.REASON_INSUFFICIENT_INCOME,
-            Loan.REASON_POOR_CREDIT_HISTORY,
-            Loan.REASON_INCOMPLETE_DOCUMENTATION,
-            Loan.REASON_EXCEEDS_LIMIT
-        ]
-        
-        if data['rejection_reason'] not in valid_reasons:
+        if data['rejection_reason'] not in VALID_REJECTION_REASONS:
             return jsonify({'error': 'Invalid rejection reason code'}), 400
         
         # Update loan status
         loan.status = Loan.REJECTED
         loan.reviewed_at = datetime.utcnow()
-        loan.reviewed_by = user_id
+        loan.reviewed_by = admin_id
         loan.rejection_reason = data['rejection_reason']
         loan.admin_notes = data.get('admin_notes', '')
         
-        db.session.commit()
+        # Queue the email notification with rejection reason in the same transaction
+        queue_loan_notification(loan, 'rejected')
+        bump_cache_version(PENDING_LOANS_CACHE)
         
-        # Send email notification to user with rejection reason
-        try:
-            send_loan_notification(loan, 'rejected')
-            print(f"Rejection email sent successfully to {loan.user.email} with reason: {loan.rejection_reason}")
-        except Exception as e:
-            print(f"Failed to send rejection email notification: {e}")
-            # Don't fail the request if email fails, just log the error
+        db.session.commit()
         
         return jsonify({
-            'message': 'Loan rejected successfully. Email notification sent to user with rejection reason.',
+            'message': 'Loan rejected successfully. Email notification queued for user with rejection reason.',
             'loan': loan.to_dict()
         }), 200
     
@@ -124,37 +117,276 @@ def reject_loan(loan_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@admin_bp.route('/loans/pending', methods=['GET'])
-@jwt_required()
-def get_pending_loans():
+def _validate_decision(item):
+    """Return an error message for an invalid bulk decision item, or None"""
+    if not isinstance(item, dict):
+        return 'Decision must be an object'
+    loan_id = item.get('loan_id')
+    if not isinstance(loan_id, int) or isinstance(loan_id, bool):
+        return 'loan_id must be an integer'
+    if item.get('action') not in ('approve', 'reject'):
+        return 'action must be approve or reject'
+    if item['action'] == 'reject':
+        if not item.get('rejection_reason'):
+            return 'Rejection reason is required'
+        if item['rejection_reason'] not in VALID_REJECTION_REASONS:
+            return 'Invalid rejection reason code'
+    if not isinstance(item.get('admin_notes', ''), str):
+        return 'admin_notes must be a string'
+    return None
+
+def _apply_decisions(chunk, admin_id):
+    """Apply one chunk of validated decisions in a single status-guarded UPDATE
+
+    Returns the ids of the loans that were decided; the rest were missing or
+    no longer pending. The caller commits.
+    """
+    by_id = {item['loan_id']: item for item in chunk}
+    
+    # Lock the still-pending rows so the UPDATE below affects exactly these
+    pending_ids = [row.id for row in db.session.query(Loan.id).filter(
+        Loan.id.in_(by_id),
+        Loan.status == Loan.PENDING
+    ).with_for_update()]
+    
+    if not pending_ids:
+        return set()
+    
+    statuses = {}
+    reasons = {}
+    notes = {}
+    for loan_id in pending_ids:
+        item = by_id[loan_id]
+        if item['action'] == 'approve':
+            statuses[loan_id] = Loan.APPROVED
+        else:
+            statuses[loan_id] = Loan.REJECTED
+            reasons[loan_id] = item['rejection_reason']
+        notes[loan_id] = item.get('admin_notes', '')
+    
+    Loan.query.filter(
+        Loan.id.in_(pending_ids),
+        Loan.status == Loan.PENDING
+    ).update({
+        Loan.status: case(statuses, value=Loan.id),
+        Loan.rejection_reason: case(reasons, value=Loan.id) if reasons else None,
+        Loan.admin_notes: case(notes, value=Loan.id),
+        Loan.reviewed_at: datetime.utcnow(),
+        Loan.reviewed_by: admin_id
+    }, synchronize_session=False)
+    
+    # Queue notifications in the same transaction as the decisions
+    decided = Loan.query.options(joinedload(Loan.user)).filter(
+        Loan.id.in_(pending_ids)
+    ).populate_existing().all()
+    for loan in decided:
+        queue_loan_notification(loan, loan.status)
+    
+    return set(pending_ids)
+
+@admin_bp.route('/loans/bulk-decision', methods=['POST'])
+@require_role('admin')
+def bulk_decision():
+    """Approve and/or reject many loans in one request
+
+    Every item is validated before anything is written; an invalid item fails
+    the whole request with 400. Valid decisions are applied in chunks of
+    BULK_DECISION_CHUNK_SIZE, one transaction each, and the response reports
+    the outcome per item in request order.
+    """
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
+        admin_id = get_token_identity().id
         
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        data = request.get_json(silent=True) or {}
+        decisions = data.get('decisions') if isinstance(data, dict) else None
         
-        loans = Loan.query.filter_by(status=Loan.PENDING).order_by(Loan.created_at.asc()).all()
+        if not isinstance(decisions, list) or not decisions:
+            return jsonify({'error': 'decisions must be a non-empty list'}), 400
+        
+        if len(decisions) > BULK_DECISION_MAX_ITEMS:
+            return jsonify({'error': f'At most {BULK_DECISION_MAX_ITEMS} decisions per request'}), 400
+        
+        errors = []
+        seen = set()
+        for index, item in enumerate(decisions):
+            error = _validate_decision(item)
+            if not error and item['loan_id'] in seen:
+                error = 'Duplicate loan_id'
+            if error:
+                errors.append({
+                    'index': index,
+                    'loan_id': item.get('loan_id') if isinstance(item, dict) else None,
+                    'error': error
+                })
+            else:
+                seen.add(item['loan_id'])
+        
+        if errors:
+            return jsonify({'error': 'Invalid decisions', 'errors': errors}), 400
+        
+        decided = set()
+        for start in range(0, len(decisions), BULK_DECISION_CHUNK_SIZE):
+            chunk_decided = _apply_decisions(decisions[start:start + BULK_DECISION_CHUNK_SIZE], admin_id)
+            if chunk_decided:
+                bump_cache_version(PENDING_LOANS_CACHE)
+            decided |= chunk_decided
+            db.session.commit()
+            # Keep the identity map from growing across chunks
+            db.session.expunge_all()
+        
+        # Tell "not found" apart from "already decided" for the loans that were skipped
+        skipped = [item['loan_id'] for item in decisions if item['loan_id'] not in decided]
+        existing = set()
+        for start in range(0, len(skipped), BULK_DECISION_CHUNK_SIZE):
+            existing.update(row.id for row in db.session.query(Loan.id).filter(
+                Loan.id.in_(skipped[start:start + BULK_DECISION_CHUNK_SIZE])
+            ))
+        
+        results = []
+        for item in decisions:
+            loan_id = item['loan_id']
+            if loan_id in decided:
+                status = Loan.APPROVED if item['action'] == 'approve' else Loan.REJECTED
+                results.append({'loan_id': loan_id, 'success': True, 'status': status})
+            elif loan_id in existing:
+                results.append({'loan_id': loan_id, 'success': False, 'error': 'Loan is not pending'})
+            else:
+                results.append({'loan_id': loan_id, 'success': False, 'error': 'Loan not found'})
         
         return jsonify({
-            'loans': [loan.to_dict() for loan in loans]
+            'message': f'{len(decided)} of {len(decisions)} loans decided. Email notifications queued for users.',
+            'results': results
         }), 200
     
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@admin_bp.route('/rejection-reasons', methods=['GET'])
-@jwt_required()
-def get_rejection_reasons():
+@admin_bp.route('/loans/pending', methods=['GET'])
+@require_role('admin')
+@replica_read
+def get_pending_loans():
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
+        page = get_page_args(request.args)
+        
+        # Read the version before the loans so a cached payload is never
+        # older than the version it is stored under
+        version = get_cache_version(PENDING_LOANS_CACHE)
+        cache = get_response_cache(PENDING_LOANS_CACHE)
+        cache_key = f'{version}:{page}'
         
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
+        if version is not None:
+            payload = cache.get(cache_key)
+            if payload is not None:
+                return current_app.response_class(payload, mimetype='application/json'), 200
         
+        # Loans and their owners in one column-projected query, no ORM instances
+        query = select_loans(include_user=True).where(Loan.status == Loan.PENDING)
+        
+        next_cursor = None
+        if page:
+            limit, cursor = page
+            rows, next_cursor = paginate_keyset(query, Loan, limit, cursor, descending=False)
+        else:
+            rows = db.session.execute(query.order_by(Loan.created_at.asc())).all()
+        
+        response = jsonify({
+            'loans': [loan_row_to_dict(row, include_user=True) for row in rows],
+            'next_cursor': next_cursor
+        })
+        if version is not None:
+            cache.set(cache_key, response.get_data())
+        return response, 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _parse_export_date(value, end_of_day=False):
+    """Parse a YYYY-MM-DD (or full ISO) export bound; a bare end date includes the whole day"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def _export_rows(query):
+    """Yield loan dicts from a server-side cursor, EXPORT_BATCH_SIZE rows at a time"""
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in result:
+        yield loan_row_to_dict(row, include_user=True)
+
+def _ndjson_stream(rows):
+    for row in rows:
+        yield current_app.json.dumps(row) + '\n'
+
+def _csv_stream(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    
+    for i, row in enumerate(rows, 1):
+        user = row.pop('user') or {}
+        row['username'] = user.get('username')
+        row['email'] = user.get('email')
+        writer.writerow(row)
+        # Flush in chunks so the response streams without buffering the whole file
+        if i % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+@admin_bp.route('/loans/export', methods=['GET'])
+@require_role('admin')
+@replica_read
+def export_loans():
+    """Stream the loan book as NDJSON or CSV, filtered by status and created_at range"""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Format must be ndjson or csv'}), 400
+        
+        query = select_loans(include_user=True)
+        
+        status = request.args.get('status')
+        if status:
+            if status not in (Loan.PENDING, Loan.APPROVED, Loan.REJECTED):
+                return jsonify({'error': 'Invalid status'}), 400
+            query = query.where(Loan.status == status)
+        
+        if request.args.get('from'):
+            query = query.where(Loan.created_at >= _parse_export_date(request.args['from']))
+        if request.args.get('to'):
+            query = query.where(Loan.created_at < _parse_export_date(request.args['to'], end_of_day=True))
+        
+        query = query.order_by(Loan.created_at.asc(), Loan.id.asc())
+        rows = _export_rows(query)
+        
+        if export_format == 'csv':
+            body, mimetype = _csv_stream(rows), 'text/csv'
+        else:
+            body, mimetype = _ndjson_stream(rows), 'application/x-ndjson'
+        
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=loans.{export_format}'}
+        )
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/rejection-reasons', methods=['GET'])
+@require_role('admin')
+def get_rejection_reasons():
+    try:
         reasons = [
             {
                 'code': Loan.REASON_INSUFFICIENT_INCOME,
@@ -1,16 +1,20 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models import User, PendingRegistration, PendingLogin, PasswordReset
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User, PendingRegistration, PendingLogin, PasswordReset, normalize_email
 from db import db
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash
 from utils.email_service import send_otp_email, send_password_reset_otp
-from sqlalchemy import func
+from utils.auth_tokens import create_user_token, invalidate_user_tokens
+from utils.etag import conditional_response
+from utils.password_hashing import PasswordHashingBusy, get_password_hasher
+from utils.rate_limit import rate_limit
+from utils.otp_challenge import is_challenge_token, issue_login_challenge, verify_login_challenge, reissue_login_challenge, record_failed_otp
 import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register', ip=(20, 3600), email=(5, 3600))
 def register():
     try:
         data = request.get_json()
@@ -18,15 +22,18 @@ def register():
         if not data or not data.get('username') or not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Username, email, and password are required'}), 400
         
+        # Same normalization as every other email lookup (see models.normalize_email)
+        email = normalize_email(data['email'])
+        
         # Check if user already exists
         if User.query.filter_by(username=data['username']).first():
             return jsonify({'error': 'Username already exists'}), 400
         
-        if User.query.filter_by(email=data['email']).first():
+        if User.query.filter_by(email_normalized=email).first():
             return jsonify({'error': 'Email already exists'}), 400
         
         # Check if there's already a pending registration for this email
-        existing_pending = PendingRegistration.query.filter_by(email=data['email']).first()
+        existing_pending = PendingRegistration.query.filter_by(email=email).first()
         if existing_pending:
             # Delete old pending registration
             db.session.delete(existing_pending)
@@ -35,8 +42,8 @@ def register():
         # Create pending registration
         pending_reg = PendingRegistration(
             username=data['username'],
-            email=data['email'],
-            password_hash=generate_password_hash(data['password']),
+            email=email,
+            password_hash=get_password_hasher().hash(data['password']),
             role=data.get('role', 'user')
         )
         
@@ -67,6 +74,9 @@ def register():
             'email': pending_reg.email
         }), 200
     
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -99,7 +109,7 @@ def verify_otp():
             db.session.commit()
             return jsonify({'error': 'Username already exists'}), 400
         
-        if User.query.filter_by(email=pending_reg.email).first():
+        if User.query.filter_by(email_normalized=normalize_email(pending_reg.email)).first():
             db.session.delete(pending_reg)
             db.session.commit()
             return jsonify({'error': 'Email already exists'}), 400
@@ -117,7 +127,7 @@ def verify_otp():
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'Registration completed successfully',
@@ -130,6 +140,7 @@ def verify_otp():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/resend-otp', methods=['POST'])
+@rate_limit('resend_otp', ip=(20, 3600), pending_registration_id=(3, 600))
 def resend_otp():
     """Resend OTP for pending registration"""
     try:
@@ -177,6 +188,7 @@ def resend_otp():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', ip=(30, 300), username=(10, 300))
 def login():
     """Unified login - Handles both admin and user authentication"""
     try:
@@ -190,9 +202,15 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade a hash made with an outdated method or cost while we have the password
+        hasher = get_password_hasher()
+        if hasher.needs_rehash(user.password_hash):
+            user.password_hash = hasher.hash(data['password'])
+            db.session.commit()
+        
         # Admin users login directly without OTP
         if user.role == 'admin':
-            access_token = create_access_token(identity=str(user.id))
+            access_token = create_user_token(user)
             return jsonify({
                 'message': 'Login successful',
                 'access_token': access_token,
@@ -201,6 +219,9 @@ def login():
             }), 200
         
         # Regular users require OTP verification
+        if current_app.config.get('LOGIN_OTP_MODE') == 'stateless':
+            return _start_stateless_login(user)
+        
         # Check if there's already a pending login for this user
         existing_pending = PendingLogin.query.filter_by(user_id=user.id).first()
         if existing_pending:
@@ -242,10 +263,39 @@ def login():
             'requires_otp': True
         }), 200
     
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _start_stateless_login(user):
+    """Send a login OTP bound to a signed challenge instead of a PendingLogin row"""
+    otp, challenge = issue_login_challenge(user.id)
+    
+    # Send OTP email
+    email_sent = send_otp_email(user.email, otp, user.username, is_login=True)
+    
+    if not email_sent:
+        # If email fails, log OTP to console for development/testing
+        print("\n" + "="*60)
+        print("[WARNING] EMAIL SENDING FAILED - DEVELOPMENT MODE")
+        print("="*60)
+        print(f"LOGIN OTP for {user.email}: {otp}")
+        print("="*60)
+        print("You can use this OTP to test the login flow.")
+        print("Fix email configuration to receive OTPs via email.")
+        print("="*60 + "\n")
+    
+    # The challenge goes back as pending_login_id so clients don't need to change
+    return jsonify({
+        'message': 'OTP sent to your email. Please verify to complete login.',
+        'pending_login_id': challenge,
+        'email': user.email,
+        'requires_otp': True
+    }), 200
+
 @auth_bp.route('/admin/login', methods=['POST'])
 def admin_login():
     """Admin login - Alias for unified login endpoint (backward compatibility)"""
@@ -253,6 +303,7 @@ def admin_login():
     return login()
 
 @auth_bp.route('/verify-login-otp', methods=['POST'])
+@rate_limit('verify_login_otp', ip=(30, 300), pending_login_id=(10, 600))
 def verify_login_otp():
     """Verify OTP and complete login"""
     try:
@@ -264,14 +315,34 @@ def verify_login_otp():
         pending_login_id = data['pending_login_id']
         provided_otp = data['otp']
         
+        # Signed challenge from stateless mode: no pending_logins row to check or delete
+        if is_challenge_token(pending_login_id):
+            user_id = verify_login_challenge(pending_login_id, provided_otp)
+            if not user_id:
+                return jsonify({'error': 'Invalid or expired OTP'}), 400
+            
+            user = User.query.get(user_id)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            
+            access_token = create_user_token(user)
+            return jsonify({
+                'message': 'Login successful',
+                'access_token': access_token,
+                'user': user.to_dict()
+            }), 200
+        
         # Find pending login
         pending_login = PendingLogin.query.get(pending_login_id)
         
         if not pending_login:
             return jsonify({'error': 'Invalid or expired login request'}), 400
         
-        # Verify OTP
+        # Verify OTP; too many wrong guesses use the pending login up
         if not pending_login.is_otp_valid(provided_otp):
+            if record_failed_otp(f"pending-login:{pending_login.id}"):
+                db.session.delete(pending_login)
+                db.session.commit()
             return jsonify({'error': 'Invalid or expired OTP'}), 400
         
         # Get the user
@@ -287,7 +358,7 @@ def verify_login_otp():
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'Login successful',
@@ -300,6 +371,7 @@ def verify_login_otp():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/resend-login-otp', methods=['POST'])
+@rate_limit('resend_login_otp', ip=(20, 3600), pending_login_id=(3, 600))
 def resend_login_otp():
     """Resend OTP for pending login"""
     try:
@@ -310,6 +382,26 @@ def resend_login_otp():
         
         pending_login_id = data['pending_login_id']
         
+        if is_challenge_token(pending_login_id):
+            reissued = reissue_login_challenge(pending_login_id)
+            if not reissued:
+                return jsonify({'error': 'Invalid or expired login request'}), 400
+            
+            user_id, otp, challenge = reissued
+            user = User.query.get(user_id)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            
+            email_sent = send_otp_email(user.email, otp, user.username, is_login=True)
+            if not email_sent:
+                print(f"RESENT LOGIN OTP for {user.email}: {otp}")
+            
+            return jsonify({
+                'message': 'OTP resent to your email',
+                'pending_login_id': challenge,
+                'email': user.email
+            }), 200
+        
         # Find pending login
         pending_login = PendingLogin.query.get(pending_login_id)
         
@@ -401,12 +493,15 @@ def get_current_user():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        # The row is tiny; the ETag saves re-serializing and re-sending it
+        version = (user.id, user.username, user.email, user.role, user.profile_completed, user.created_at)
+        return conditional_response(version, lambda: (jsonify({'user': user.to_dict()}), 200))
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@rate_limit('forgot_password', ip=(10, 3600), email=(3, 3600))
 def forgot_password():
     """Request password reset OTP"""
     try:
@@ -415,11 +510,8 @@ def forgot_password():
         if not data or not data.get('email'):
             return jsonify({'error': 'Email is required'}), 400
         
-        email = data['email'].strip().lower()
-        
-        # Find user by email (case-insensitive search)
-        # For cross-database compatibility, use filter with func.lower
-        user = User.query.filter(func.lower(User.email) == email).first()
+        # Case-insensitive match as an index seek on the normalized column
+        user = User.query.filter_by(email_normalized=normalize_email(data['email'])).first()
         
         # Always return success message to prevent email enumeration
         # Only send OTP if user exists
@@ -550,7 +642,9 @@ def reset_password():
             return jsonify({'error': 'Password must be at least 8 characters long'}), 400
         
         # Find password reset request by token
-        password_reset = PasswordReset.query.filter_by(reset_token=reset_token).first()
+        password_reset = PasswordReset.query.filter_by(
+            reset_token_hash=PasswordReset.hash_reset_token(reset_token)
+        ).first()
         
         if not password_reset:
             return jsonify({'error': 'Invalid or expired reset token'}), 400
@@ -564,8 +658,9 @@ def reset_password():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Update password
+        # Update password and revoke tokens issued with the old one
         user.set_password(new_password)
+        invalidate_user_tokens(user)
         
         # Mark reset token as used
         password_reset.mark_reset_token_used()
@@ -578,7 +673,7 @@ def reset_password():
         db.session.commit()
         
         # Create access token (same as login)
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_user_token(user)
         
         # Return same auth response as login
         return jsonify({
@@ -588,6 +683,9 @@ def reset_password():
             'user': user.to_dict()
         }), 200
     
+    except PasswordHashingBusy:
+        db.session.rollback()
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503
     except Exception as e:
         db.session.rollback()
         print(f"Error in reset_password: {str(e)}")
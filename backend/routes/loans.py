@@ -1,48 +1,86 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import User, Loan
+from models import Loan
 from db import db
 from datetime import datetime
+from sqlalchemy import case, func
+from utils.etag import conditional_response
+from utils.loan_queries import loan_row_to_dict, select_loans
+from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version, get_cache_version
+from utils.pagination import get_page_args, paginate_keyset
+from utils.auth_tokens import require_role, get_token_identity
+from utils.read_replicas import replica_read
 
 loans_bp = Blueprint('loans', __name__)
 
+def _loan_list_version():
+    """Aggregate columns that change whenever a loan list's content does"""
+    return [
+        func.count(Loan.id),
+        func.max(Loan.updated_at),
+        # Decisions inside one updated_at tick still change the status mix
+        func.sum(case((Loan.status == Loan.PENDING, 1), else_=0)),
+        func.sum(case((Loan.status == Loan.APPROVED, 1), else_=0))
+    ]
+
 @loans_bp.route('', methods=['GET'])
-@jwt_required()
+@require_role()
+@replica_read
 def get_loans():
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
+        # Role and profile status come from the token claims, not a User query
+        user = get_token_identity()
         
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        page = get_page_args(request.args)
         
         # Admin can see all loans, users see only their own
-        if user.role == 'admin':
-            loans = Loan.query.order_by(Loan.created_at.desc()).all()
+        # Admins get the owning user embedded, loaded in the same query
+        # Rows are read with a column-projected Core SELECT (see utils/loan_queries.py)
+        include_user = user.role == 'admin'
+        query = select_loans(include_user)
+        if include_user:
+            # Every loan write and profile completion bumps this row in its own
+            # transaction, so one primary-key read versions the whole list
+            # instead of an aggregate over every loan on every page
+            list_version = get_cache_version(PENDING_LOANS_CACHE)
         else:
             # Check if profile is completed for regular users
             if not user.profile_completed:
                 return jsonify({'error': 'Please complete your profile first'}), 400
-            loans = Loan.query.filter_by(user_id=int(user_id)).order_by(Loan.created_at.desc()).all()
-        
-        return jsonify({
-            'loans': [loan.to_dict() for loan in loans]
-        }), 200
+            query = query.where(Loan.user_id == user.id)
+            # Only the borrower's own rows, through ix_loans_user_id_created_at
+            list_version = tuple(db.session.query(*_loan_list_version()).filter(Loan.user_id == user.id).one())
+        
+        def build_response():
+            next_cursor = None
+            if page:
+                limit, cursor = page
+                rows, next_cursor = paginate_keyset(query, Loan, limit, cursor, descending=True)
+            else:
+                rows = db.session.execute(query.order_by(Loan.created_at.desc())).all()
+            
+            return jsonify({
+                'loans': [loan_row_to_dict(row, include_user) for row in rows],
+                'next_cursor': next_cursor
+            }), 200
+        
+        if list_version is None:
+            # Nothing has bumped the version yet, so it can't vouch for the list
+            return build_response()
+        
+        # Unchanged lists are answered with 304 after just the version query
+        return conditional_response((user.id, user.role, list_version), build_response)
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @loans_bp.route('', methods=['POST'])
-@jwt_required()
+@require_role()
 def create_loan():
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        # Role and profile status come from the token claims, not a User query
+        user = get_token_identity()
         
         # Check if profile is completed
         if not user.profile_completed:
@@ -59,13 +97,14 @@ def create_loan():
         
         # Create new loan
         loan = Loan(
-            user_id=int(user_id),
+            user_id=user.id,
             amount=amount,
             purpose=data['purpose'],
             status=Loan.PENDING
         )
         
         db.session.add(loan)
+        bump_cache_version(PENDING_LOANS_CACHE)
         db.session.commit()
         
         return jsonify({
@@ -80,15 +119,12 @@ def create_loan():
         return jsonify({'error': str(e)}), 500
 
 @loans_bp.route('/<int:loan_id>', methods=['GET'])
-@jwt_required()
+@require_role()
+@replica_read
 def get_loan(loan_id):
     try:
-        user_id = get_jwt_identity()
-        # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        # Role and profile status come from the token claims, not a User query
+        user = get_token_identity()
         
         loan = Loan.query.get(loan_id)
         
@@ -96,7 +132,7 @@ def get_loan(loan_id):
             return jsonify({'error': 'Loan not found'}), 404
         
         # Users can only see their own loans, admins can see all
-        if user.role != 'admin' and loan.user_id != int(user_id):
+        if user.role != 'admin' and loan.user_id != user.id:
             return jsonify({'error': 'Unauthorized'}), 403
         
         return jsonify({'loan': loan.to_dict()}), 200
@@ -3,6 +3,10 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, Profile
 from db import db
 from datetime import datetime
+from utils.auth_tokens import create_user_token
+from utils.etag import conditional_response
+from utils.read_replicas import replica_read
+from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -16,6 +20,7 @@ def log_request():
 
 @profile_bp.route('', methods=['GET'])
 @jwt_required()
+@replica_read
 def get_profile():
     try:
         # Debug logging
@@ -26,18 +31,28 @@ def get_profile():
         user_id = get_jwt_identity()
         print(f"Profile GET - User ID from token: {user_id}")
         # Convert string ID back to integer for database query
-        user = User.query.get(int(user_id))
+        user_id = int(user_id)
         
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        # One-row version lookup; the profile itself is only loaded on a cache miss
+        version = db.session.query(User.profile_completed, Profile.id, Profile.updated_at).outerjoin(
+            Profile, Profile.user_id == User.id
+        ).filter(User.id == user_id).first()
         
-        if not user.profile:
-            return jsonify({'profile': None, 'profile_completed': False}), 200
+        if not version:
+            return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'profile': user.profile.to_dict(),
-            'profile_completed': user.profile_completed
-        }), 200
+        def build_response():
+            user = User.query.get(user_id)
+            
+            if not user.profile:
+                return jsonify({'profile': None, 'profile_completed': False}), 200
+            
+            return jsonify({
+                'profile': user.profile.to_dict(),
+                'profile_completed': user.profile_completed
+            }), 200
+        
+        return conditional_response((user_id,) + tuple(version), build_response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -103,6 +118,9 @@ def create_or_update_profile():
             return jsonify({'error': 'Annual income is required'}), 400
         
         # Mark profile as completed
+        if not user.profile_completed:
+            # Pending loans embed their owner's profile_completed
+            bump_cache_version(PENDING_LOANS_CACHE)
         user.profile_completed = True
         
         db.session.commit()
@@ -110,7 +128,9 @@ def create_or_update_profile():
         return jsonify({
             'message': 'Profile saved successfully',
             'profile': profile.to_dict(),
-            'profile_completed': True
+            'profile_completed': True,
+            # Fresh token whose claims reflect the completed profile
+            'access_token': create_user_token(user)
         }), 200
     
     except ValueError as e:
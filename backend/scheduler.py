@@ -1,61 +1,273 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
 from datetime import datetime, timedelta
-from models import Loan
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from models import Loan, JobRun, PendingRegistration, PendingLogin, PasswordReset
 from db import db
-from utils.email_service import send_loan_notification
+from utils.email_outbox import queue_loan_notification, dispatch_email_outbox
+from utils.job_lease import acquire_job_lease, get_lease_holder, holding_job_lease, renew_job_lease
+from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version
 
-def auto_reject_old_loans(app):
-    """Automatically reject loans that have been pending for more than 5 days"""
+# Number of loans rejected per UPDATE/commit in bulk mode
+AUTO_REJECT_CHUNK_SIZE = 500
+AUTO_REJECT_NOTES = 'Automatically rejected after 5 days of no action'
+AUTO_REJECT_INTERVAL = timedelta(hours=1)
+EMAIL_OUTBOX_INTERVAL = timedelta(seconds=30)
+# Rows deleted per DELETE/commit when purging expired OTP and reset rows
+AUTH_PURGE_CHUNK_SIZE = 1000
+AUTH_PURGE_INTERVAL = timedelta(minutes=15)
+
+def auto_reject_old_loans(app, bulk=True, chunk_size=AUTO_REJECT_CHUNK_SIZE):
+    """Automatically reject loans that have been pending for more than 5 days
+
+    In bulk mode (the default) stale loans are rejected with set-based
+    UPDATEs of at most chunk_size rows, each in its own short transaction
+    that also queues the chunk's notifications in the email outbox.
+    Returns the number of rejected loans.
+    """
     with app.app_context():
         try:
             # Calculate the date 5 days ago
             cutoff_date = datetime.utcnow() - timedelta(days=5)
             
-            # Find all pending loans older than 5 days
-            old_loans = Loan.query.filter(
-                Loan.status == Loan.PENDING,
-                Loan.created_at <= cutoff_date
-            ).all()
-            
-            rejected_count = 0
-            for loan in old_loans:
-                loan.status = Loan.REJECTED
-                loan.rejection_reason = Loan.REASON_AUTO_REJECTED
-                loan.reviewed_at = datetime.utcnow()
-                loan.admin_notes = 'Automatically rejected after 5 days of no action'
-                
-                # Send email notification
-                try:
-                    send_loan_notification(loan, 'rejected')
-                except Exception as e:
-                    print(f"Failed to send email notification for loan {loan.id}: {e}")
-                
-                rejected_count += 1
+            if bulk:
+                rejected_count = _auto_reject_in_chunks(cutoff_date, chunk_size)
+            else:
+                rejected_count = _auto_reject_one_by_one(cutoff_date)
             
             if rejected_count > 0:
-                db.session.commit()
                 print(f"Auto-rejected {rejected_count} loan(s) that were pending for more than 5 days")
             else:
                 print("No loans to auto-reject")
+            return rejected_count
         
         except Exception as e:
             db.session.rollback()
             print(f"Error in auto_reject_old_loans: {e}")
+            return 0
+
+def _auto_reject_one_by_one(cutoff_date):
+    """Load every stale loan into the session and reject it in a single transaction"""
+    # Find all pending loans older than 5 days, locked so an overlapping run
+    # (or an admin decision) can't change them before this commits
+    old_loans = Loan.query.options(joinedload(Loan.user)).filter(
+        Loan.status == Loan.PENDING,
+        Loan.created_at <= cutoff_date
+    ).with_for_update(of=Loan, skip_locked=True).all()
+    
+    rejected_count = 0
+    for loan in old_loans:
+        loan.status = Loan.REJECTED
+        loan.rejection_reason = Loan.REASON_AUTO_REJECTED
+        loan.reviewed_at = datetime.utcnow()
+        loan.admin_notes = AUTO_REJECT_NOTES
+        
+        # Queue the notification in the same transaction as the rejection
+        queue_loan_notification(loan, 'rejected')
+        
+        rejected_count += 1
+    
+    if rejected_count > 0:
+        bump_cache_version(PENDING_LOANS_CACHE)
+        db.session.commit()
+    return rejected_count
+
+def _auto_reject_in_chunks(cutoff_date, chunk_size):
+    """Reject stale loans chunk by chunk with one UPDATE and commit per chunk"""
+    rejected_count = 0
+    
+    while True:
+        # Walks ix_loans_status_created_at; rows rejected by the previous
+        # chunk are no longer pending, so no offset is needed. The rows are
+        # locked until the chunk commits, so the UPDATE below changes exactly
+        # these loans; an overlapping run skips them and takes the next ones.
+        loan_ids = [row.id for row in db.session.query(Loan.id).filter(
+            Loan.status == Loan.PENDING,
+            Loan.created_at <= cutoff_date
+        ).order_by(Loan.created_at, Loan.id).limit(chunk_size).with_for_update(skip_locked=True)]
+        
+        if not loan_ids:
+            break
+        
+        # Status guard: skip loans an admin decided on since the SELECT
+        updated = Loan.query.filter(
+            Loan.id.in_(loan_ids),
+            Loan.status == Loan.PENDING
+        ).update({
+            Loan.status: Loan.REJECTED,
+            Loan.rejection_reason: Loan.REASON_AUTO_REJECTED,
+            Loan.reviewed_at: datetime.utcnow(),
+            Loan.admin_notes: AUTO_REJECT_NOTES
+        }, synchronize_session=False)
+        
+        # Queue notifications in the same transaction as the rejection
+        rejected_loans = Loan.query.options(joinedload(Loan.user)).filter(
+            Loan.id.in_(loan_ids)
+        ).populate_existing().all()
+        for loan in rejected_loans:
+            queue_loan_notification(loan, 'rejected')
+        
+        if updated:
+            bump_cache_version(PENDING_LOANS_CACHE)
+        db.session.commit()
+        # Drop the loaded loans so long runs don't grow the identity map
+        db.session.expunge_all()
+        
+        rejected_count += updated
+        
+        if not renew_job_lease():
+            break
+    
+    return rejected_count
+
+def _expired_auth_filters(now):
+    """(model, filters) pairs selecting rows that can no longer be used"""
+    return [
+        (PendingRegistration, [PendingRegistration.otp_expires_at < now]),
+        (PendingLogin, [PendingLogin.otp_expires_at < now]),
+        # A reset outlives its OTP once the token has been issued
+        (PasswordReset, [
+            PasswordReset.otp_expires_at < now,
+            or_(PasswordReset.reset_token_expires_at.is_(None),
+                PasswordReset.reset_token_expires_at < now)
+        ])
+    ]
+
+def purge_expired_auth_rows(app, chunk_size=AUTH_PURGE_CHUNK_SIZE):
+    """Delete expired pending registrations, pending logins and password resets
+
+    Each table is purged in DELETEs of at most chunk_size rows found through
+    the otp_expires_at index, one short transaction per chunk so the purge
+    never holds long locks. Returns the number of deleted rows.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        deleted_count = 0
+        
+        for model, filters in _expired_auth_filters(now):
+            while True:
+                ids = [row.id for row in db.session.query(model.id).filter(*filters).limit(chunk_size)]
+                if not ids:
+                    break
+                
+                deleted_count += model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                
+                if not renew_job_lease():
+                    return deleted_count
+        
+        if deleted_count > 0:
+            print(f"Purged {deleted_count} expired OTP/password reset row(s)")
+        return deleted_count
 
-def init_scheduler(app, db_instance):
-    """Initialize and start the scheduler"""
-    scheduler = BackgroundScheduler()
+def run_singleton_job(app, job_id, func, lease_seconds, *args, holder=None):
+    """Run func(app, *args) only if this process wins the lease, recording a JobRun
+
+    func should return the number of rows it affected, and call
+    renew_job_lease() between units of work so a run longer than one
+    interval keeps the lease (stopping once it has lost it).
+    """
+    holder = holder or get_lease_holder()
+    
+    with app.app_context():
+        try:
+            if not acquire_job_lease(job_id, lease_seconds, holder=holder):
+                return None
+            
+            job_run = JobRun(job_id=job_id, holder=holder, status=JobRun.RUNNING, started_at=datetime.utcnow())
+            db.session.add(job_run)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error acquiring lease for job {job_id}: {e}")
+            return None
+        
+        try:
+            with holding_job_lease(job_id, lease_seconds, holder):
+                job_run.rows_affected = func(app, *args)
+            job_run.status = JobRun.SUCCEEDED
+        except Exception as e:
+            job_run.status = JobRun.FAILED
+            job_run.error = str(e)
+            print(f"Job {job_id} failed: {e}")
+        
+        try:
+            job_run.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to record run of job {job_id}: {e}")
+        
+        return job_run.id
+
+def init_scheduler(app, db_instance, scheduler_class=BackgroundScheduler):
+    """Initialize the scheduler; start_scheduler() starts it
+
+    Every gunicorn worker builds and starts its own scheduler (see
+    post_worker_init in gunicorn.conf.py); run_singleton_job makes sure only
+    the process holding the database lease actually runs a job.
+    """
+    scheduler = scheduler_class()
     
     # Schedule the auto-reject job to run every hour
     scheduler.add_job(
-        func=auto_reject_old_loans,
-        args=[app],
+        func=run_singleton_job,
+        args=[app, 'auto_reject_loans', auto_reject_old_loans, AUTO_REJECT_INTERVAL.total_seconds()],
         trigger='interval',
-        hours=1,
+        seconds=AUTO_REJECT_INTERVAL.total_seconds(),
         id='auto_reject_loans',
         name='Auto-reject loans pending for more than 5 days',
         replace_existing=True
     )
     
+    # Drain the email outbox, starting as soon as the scheduler does so a
+    # backlog left by a restart goes out straight away
+    scheduler.add_job(
+        func=run_singleton_job,
+        args=[app, 'dispatch_email_outbox', dispatch_email_outbox, EMAIL_OUTBOX_INTERVAL.total_seconds()],
+        trigger='interval',
+        seconds=EMAIL_OUTBOX_INTERVAL.total_seconds(),
+        next_run_time=datetime.now(),
+        id='dispatch_email_outbox',
+        name='Send queued email notifications',
+        replace_existing=True
+    )
+    
+    # Garbage-collect expired OTP and password reset rows
+    scheduler.add_job(
+        func=run_singleton_job,
+        args=[app, 'purge_expired_auth_rows', purge_expired_auth_rows, AUTH_PURGE_INTERVAL.total_seconds()],
+        trigger='interval',
+        seconds=AUTH_PURGE_INTERVAL.total_seconds(),
+        id='purge_expired_auth_rows',
+        name='Delete expired OTP and password reset rows',
+        replace_existing=True
+    )
+    
     return scheduler
 
+def start_scheduler(app, scheduler):
+    """Start scheduler in this process unless SCHEDULER_ENABLED is off
+
+    Safe to call more than once. Returns True if the scheduler is running.
+    """
+    if not app.config.get('SCHEDULER_ENABLED', True):
+        return False
+    if not scheduler.running:
+        scheduler.start()
+    return True
+
+def run_scheduler(app, db_instance):
+    """Run the jobs in the foreground until interrupted (flask run-scheduler)
+
+    For deployments that set SCHEDULER_ENABLED=false on the web workers and
+    run the jobs in a process of their own. The database lease still applies,
+    so running more than one of these is safe.
+    """
+    scheduler = init_scheduler(app, db_instance, scheduler_class=BlockingScheduler)
+    print(f"Running {len(scheduler.get_jobs())} scheduled jobs; press Ctrl+C to stop")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
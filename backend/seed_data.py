@@ -2,6 +2,18 @@ from app import app
 from db import db
 from models import User, Profile, Loan
 from datetime import datetime, date, timedelta
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version
+import argparse
+import csv
+import io
+import random
+import time
+
+# Rows per INSERT/COPY batch in bulk mode
+BULK_BATCH_SIZE = 10000
+DEFAULT_STATUS_MIX = {Loan.PENDING: 0.2, Loan.APPROVED: 0.5, Loan.REJECTED: 0.3}
 
 def seed_database():
     """Seed the database with initial data"""
@@ -132,6 +144,8 @@ def seed_database():
                 db.session.add(old_loan)
                 print("Created old pending loan for testing auto-rejection")
         
+        # Cached pending queues and list ETags predate these loans
+        bump_cache_version(PENDING_LOANS_CACHE)
         db.session.commit()
         print("\nDatabase seeded successfully!")
         print("\nTest Accounts:")
@@ -139,6 +153,132 @@ def seed_database():
         print("User 1: john_doe / password123")
         print("User 2: jane_smith / password123")
 
+def _insert_rows(table, columns, rows):
+    """Insert a batch of row tuples with the fastest path the dialect offers"""
+    if db.engine.dialect.name == 'postgresql':
+        # COPY streams the whole batch in one round trip
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if value is None else value for value in row])
+        buffer.seek(0)
+        raw = db.session.connection().connection
+        with raw.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+    else:
+        # executemany; PyMySQL rewrites this into multi-row INSERTs
+        db.session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+def bulk_seed(users=1000, loans=10000, status_mix=None, days=365, batch_size=BULK_BATCH_SIZE, seed=None):
+    """Generate synthetic users and loans with batched bulk inserts
+
+    Must run inside an app context. Loans are spread uniformly over the last
+    `days` days and get statuses drawn from status_mix ({status: weight}).
+    Every generated user has password 'password123'. Returns (user_count, loan_count).
+    """
+    rng = random.Random(seed)
+    status_mix = status_mix or DEFAULT_STATUS_MIX
+    statuses = list(status_mix)
+    weights = [status_mix[status] for status in statuses]
+    reject_reasons = [
+        Loan.REASON_INSUFFICIENT_INCOME,
+        Loan.REASON_POOR_CREDIT_HISTORY,
+        Loan.REASON_INCOMPLETE_DOCUMENTATION,
+        Loan.REASON_EXCEEDS_LIMIT
+    ]
+    purposes = ['Home renovation', 'Car purchase', 'Debt consolidation', 'Business expansion', 'Education', 'Medical']
+    
+    # Hashing is deliberately slow, so every generated user shares one hash
+    password_hash = generate_password_hash('password123')
+    now = datetime.utcnow()
+    # Unique per run so the generator can be re-run against the same database
+    prefix = f"bulk{int(time.time())}"
+    
+    admin = User.query.filter_by(role='admin').first()
+    reviewer_id = admin.id if admin else None
+    
+    user_columns = ['username', 'email', 'email_normalized', 'password_hash', 'role', 'profile_completed',
+                    'token_version', 'created_at']
+    for start in range(0, users, batch_size):
+        # Generated addresses are already lower-case, so email doubles as email_normalized
+        rows = [
+            (f'{prefix}_user_{i}', f'{prefix}_user_{i}@example.com', f'{prefix}_user_{i}@example.com',
+             password_hash, 'user', True, 0, now)
+            for i in range(start, min(start + batch_size, users))
+        ]
+        _insert_rows(User.__table__, user_columns, rows)
+        db.session.commit()
+    
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.username.like(f'{prefix}\\_%', escape='\\'))]
+    if not user_ids:
+        return 0, 0
+    
+    loan_columns = ['user_id', 'amount', 'purpose', 'status', 'rejection_reason', 'admin_notes',
+                    'created_at', 'updated_at', 'reviewed_at', 'reviewed_by']
+    spread_seconds = days * 24 * 3600
+    inserted = 0
+    started = time.perf_counter()
+    
+    for start in range(0, loans, batch_size):
+        count = min(batch_size, loans - start)
+        rows = []
+        for status in rng.choices(statuses, weights, k=count):
+            created_at = now - timedelta(seconds=rng.randrange(spread_seconds))
+            reviewed = status != Loan.PENDING
+            rows.append((
+                rng.choice(user_ids),
+                rng.randrange(500, 50000),
+                rng.choice(purposes),
+                status,
+                rng.choice(reject_reasons) if status == Loan.REJECTED else None,
+                None,
+                created_at,
+                created_at,
+                created_at + timedelta(days=1) if reviewed else None,
+                reviewer_id if reviewed else None
+            ))
+        _insert_rows(Loan.__table__, loan_columns, rows)
+        bump_cache_version(PENDING_LOANS_CACHE)
+        db.session.commit()
+        
+        inserted += count
+        if inserted % (batch_size * 50) == 0 or inserted == loans:
+            elapsed = time.perf_counter() - started
+            print(f"Inserted {inserted}/{loans} loans ({inserted / elapsed:,.0f} rows/s)")
+    
+    return len(user_ids), inserted
+
+def _parse_status_mix(value):
+    """Parse 'pending=0.2,approved=0.5,rejected=0.3' into a weight dict"""
+    mix = {}
+    for part in value.split(','):
+        status, _, weight = part.partition('=')
+        if status not in (Loan.PENDING, Loan.APPROVED, Loan.REJECTED):
+            raise argparse.ArgumentTypeError(f'Unknown loan status: {status}')
+        mix[status] = float(weight)
+    return mix
+
 if __name__ == '__main__':
-    seed_database()
+    parser = argparse.ArgumentParser(description='Seed the database')
+    parser.add_argument('--bulk', action='store_true', help='Generate a large synthetic dataset instead of the demo accounts')
+    parser.add_argument('--users', type=int, default=1000, help='Users to generate in bulk mode')
+    parser.add_argument('--loans', type=int, default=10000, help='Loans to generate in bulk mode')
+    parser.add_argument('--status-mix', type=_parse_status_mix, default=DEFAULT_STATUS_MIX,
+                        help='Loan status weights, e.g. pending=0.2,approved=0.5,rejected=0.3')
+    parser.add_argument('--days', type=int, default=365, help='Spread loan created_at over this many days')
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE, help='Rows per INSERT/COPY batch')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+    args = parser.parse_args()
+    
+    if args.bulk:
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            user_count, loan_count = bulk_seed(args.users, args.loans, args.status_mix, args.days, args.batch_size, args.seed)
+            print(f"\nGenerated {user_count} users and {loan_count} loans in {time.perf_counter() - started:.1f}s")
+    else:
+        seed_database()
 
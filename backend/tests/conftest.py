@@ -0,0 +1,29 @@
+import pytest
+from contextlib import contextmanager
+from app import app
+from utils.query_counter import track_queries
+
+@pytest.fixture(autouse=True)
+def disable_rate_limits(monkeypatch):
+    """Tests log in far more often than the auth rate limits allow; tests of the limits opt back in"""
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', False)
+
+@pytest.fixture
+def assert_max_queries():
+    """Context manager failing if its block runs more than max_queries SQL statements
+
+    Also fails if one statement shape repeats enough to look like an N+1,
+    unless allow_repeated is set (e.g. for deliberately chunked writes).
+
+        with assert_max_queries(2):
+            client.get('/api/admin/loans/pending', headers=headers)
+    """
+    @contextmanager
+    def check(max_queries, allow_repeated=False):
+        with track_queries() as stats:
+            yield stats
+        assert stats.count <= max_queries, \
+            f'{stats.count} SQL statements, expected at most {max_queries}:\n{stats.report()}'
+        if not allow_repeated:
+            assert not stats.repeated(), f'Likely N+1:\n{stats.report()}'
+    return check
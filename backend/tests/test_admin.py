@@ -1,7 +1,7 @@
 import pytest
 from app import app
 from db import db
-from models import User, Loan, Profile
+from models import User, Loan, Profile, EmailOutbox
 from datetime import date
 
 @pytest.fixture
@@ -67,6 +67,11 @@ def test_approve_loan(client, admin_headers, user_loan):
     assert response.status_code == 200
     data = response.get_json()
     assert data['loan']['status'] == Loan.APPROVED
+    
+    queued = EmailOutbox.query.all()
+    assert len(queued) == 1
+    assert queued[0].recipient == 'test@test.com'
+    assert queued[0].status == EmailOutbox.PENDING
 
 def test_reject_loan(client, admin_headers, user_loan):
     response = client.post(f'/api/admin/loans/{user_loan}/reject',
@@ -120,3 +125,268 @@ def test_non_admin_cannot_approve(client, user_loan):
     response = client.post(f'/api/admin/loans/{user_loan}/approve', headers=headers)
     assert response.status_code == 403
 
+
+def test_get_pending_loans_paginated(client, admin_headers, user_loan):
+    loan = Loan.query.get(user_loan)
+    for i in range(4):
+        db.session.add(Loan(user_id=loan.user_id, amount=1000 + i, purpose=f'Loan {i}', status=Loan.PENDING))
+    db.session.commit()
+    
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/admin/loans/pending?limit=2'
+        if cursor:
+            url += f'&cursor={cursor}'
+        response = client.get(url, headers=admin_headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert len(data['loans']) <= 2
+        seen.extend(l['id'] for l in data['loans'])
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+def test_get_all_loans_paginated_newest_first(client, admin_headers, user_loan):
+    loan = Loan.query.get(user_loan)
+    db.session.add(Loan(user_id=loan.user_id, amount=2000, purpose='Newer loan', status=Loan.PENDING))
+    db.session.commit()
+    
+    response = client.get('/api/loans?limit=1', headers=admin_headers)
+    assert response.status_code == 200
+    first_page = response.get_json()
+    assert first_page['loans'][0]['purpose'] == 'Newer loan'
+    
+    response = client.get(f"/api/loans?limit=1&cursor={first_page['next_cursor']}", headers=admin_headers)
+    second_page = response.get_json()
+    assert second_page['loans'][0]['id'] == user_loan
+    assert second_page['next_cursor'] is None
+
+def test_get_pending_loans_invalid_cursor(client, admin_headers):
+    response = client.get('/api/admin/loans/pending?cursor=not-a-cursor', headers=admin_headers)
+    assert response.status_code == 400
+
+def test_get_pending_loans_query_count_is_constant(client, admin_headers, assert_max_queries):
+    
+    for i in range(10):
+        borrower = User(username=f'borrower{i}', email=f'borrower{i}@test.com', role='user')
+        borrower.set_password('test123')
+        db.session.add(borrower)
+        db.session.flush()
+        db.session.add(Loan(user_id=borrower.id, amount=1000, purpose='Test loan', status=Loan.PENDING))
+    db.session.commit()
+    # Start from an empty identity map so lazy loads would really hit the database
+    db.session.expunge_all()
+    
+    # Warm this worker's token_version cache
+    client.get('/api/admin/rejection-reasons', headers=admin_headers)
+    db.session.expunge_all()
+    
+    # Admin check comes from the token claims; one query for the cache version
+    # and one for the loans with their users
+    with assert_max_queries(2):
+        response = client.get('/api/admin/loans/pending', headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data['loans']) == 10
+    assert all(loan['user']['username'].startswith('borrower') for loan in data['loans'])
+
+def test_admin_routes_authorize_from_token_claims(client, admin_headers, assert_max_queries):
+    client.get('/api/admin/rejection-reasons', headers=admin_headers)
+    
+    with assert_max_queries(0):
+        response = client.get('/api/admin/rejection-reasons', headers=admin_headers)
+    
+    assert response.status_code == 200
+
+def test_revoked_admin_token_is_rejected(client, admin_headers):
+    from utils.auth_tokens import invalidate_user_tokens, clear_token_version_cache
+    admin = User.query.filter_by(username='admin').first()
+    invalidate_user_tokens(admin)
+    db.session.commit()
+    
+    try:
+        response = client.get('/api/admin/rejection-reasons', headers=admin_headers)
+        assert response.status_code == 401
+    finally:
+        clear_token_version_cache()
+
+def test_export_loans_ndjson_filters_by_status_and_date(client, admin_headers, user_loan):
+    import json
+    from datetime import datetime
+    loan = Loan.query.get(user_loan)
+    db.session.add(Loan(user_id=loan.user_id, amount=2000, purpose='Approved loan', status=Loan.APPROVED))
+    db.session.add(Loan(user_id=loan.user_id, amount=3000, purpose='Old loan', status=Loan.PENDING,
+                        created_at=datetime(2020, 1, 15)))
+    db.session.commit()
+    
+    response = client.get('/api/admin/loans/export?format=ndjson&status=pending&from=2021-01-01',
+                          headers=admin_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == [user_loan]
+    assert rows[0]['user']['username'] == 'testuser'
+    
+    response = client.get('/api/admin/loans/export?to=2020-01-15', headers=admin_headers)
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['purpose'] for row in rows] == ['Old loan']
+
+def test_export_loans_csv(client, admin_headers, user_loan):
+    import csv
+    import io
+    response = client.get('/api/admin/loans/export?format=csv', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename=loans.csv' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 1
+    assert rows[0]['id'] == str(user_loan)
+    assert rows[0]['email'] == 'test@test.com'
+    assert rows[0]['status'] == Loan.PENDING
+
+def test_export_loans_rejects_bad_arguments(client, admin_headers):
+    assert client.get('/api/admin/loans/export?format=xml', headers=admin_headers).status_code == 400
+    assert client.get('/api/admin/loans/export?status=bogus', headers=admin_headers).status_code == 400
+    assert client.get('/api/admin/loans/export?from=yesterday', headers=admin_headers).status_code == 400
+
+def test_bulk_decision_applies_and_reports_per_item(client, admin_headers, user_loan):
+    loan = Loan.query.get(user_loan)
+    second = Loan(user_id=loan.user_id, amount=2000, purpose='Second loan', status=Loan.PENDING)
+    decided = Loan(user_id=loan.user_id, amount=3000, purpose='Decided loan', status=Loan.APPROVED)
+    db.session.add_all([second, decided])
+    db.session.commit()
+    second_id, decided_id = second.id, decided.id
+    
+    response = client.post('/api/admin/loans/bulk-decision', headers=admin_headers, json={'decisions': [
+        {'loan_id': user_loan, 'action': 'approve', 'admin_notes': 'Looks good'},
+        {'loan_id': second_id, 'action': 'reject', 'rejection_reason': Loan.REASON_EXCEEDS_LIMIT},
+        {'loan_id': decided_id, 'action': 'reject', 'rejection_reason': Loan.REASON_EXCEEDS_LIMIT},
+        {'loan_id': 999999, 'action': 'approve'}
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results == [
+        {'loan_id': user_loan, 'success': True, 'status': Loan.APPROVED},
+        {'loan_id': second_id, 'success': True, 'status': Loan.REJECTED},
+        {'loan_id': decided_id, 'success': False, 'error': 'Loan is not pending'},
+        {'loan_id': 999999, 'success': False, 'error': 'Loan not found'}
+    ]
+    
+    approved = Loan.query.get(user_loan)
+    assert approved.status == Loan.APPROVED
+    assert approved.admin_notes == 'Looks good'
+    assert approved.reviewed_by is not None
+    rejected = Loan.query.get(second_id)
+    assert rejected.status == Loan.REJECTED
+    assert rejected.rejection_reason == Loan.REASON_EXCEEDS_LIMIT
+    assert Loan.query.get(decided_id).status == Loan.APPROVED
+    
+    queued = EmailOutbox.query.order_by(EmailOutbox.id).all()
+    assert [entry.subject for entry in queued] == ['Loan Application Approved', 'Loan Application Rejected']
+
+def test_bulk_decision_validates_everything_before_writing(client, admin_headers, user_loan):
+    response = client.post('/api/admin/loans/bulk-decision', headers=admin_headers, json={'decisions': [
+        {'loan_id': user_loan, 'action': 'approve'},
+        {'loan_id': user_loan, 'action': 'approve'},
+        {'loan_id': 'abc', 'action': 'approve'},
+        {'loan_id': 5, 'action': 'reject', 'rejection_reason': 'INVALID_REASON'}
+    ]})
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert [error['index'] for error in errors] == [1, 2, 3]
+    
+    assert Loan.query.get(user_loan).status == Loan.PENDING
+    assert EmailOutbox.query.count() == 0
+
+def test_bulk_decision_uses_one_update_per_chunk(client, admin_headers, monkeypatch):
+    from sqlalchemy import event
+    import routes.admin
+    monkeypatch.setattr(routes.admin, 'BULK_DECISION_CHUNK_SIZE', 5)
+    
+    borrower = User(username='borrower', email='borrower@test.com', role='user')
+    borrower.set_password('test123')
+    db.session.add(borrower)
+    db.session.flush()
+    loans = [Loan(user_id=borrower.id, amount=1000 + i, purpose=f'Loan {i}', status=Loan.PENDING) for i in range(12)]
+    db.session.add_all(loans)
+    db.session.commit()
+    decisions = [{'loan_id': loan.id, 'action': 'approve'} for loan in loans]
+    
+    updates = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE loans'):
+            updates.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.post('/api/admin/loans/bulk-decision', headers=admin_headers,
+                               json={'decisions': decisions})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    
+    assert response.status_code == 200
+    assert all(result['success'] for result in response.get_json()['results'])
+    assert len(updates) == 3
+    assert Loan.query.filter_by(status=Loan.APPROVED).count() == 12
+
+def test_pending_queue_served_from_cache_until_version_bumped(client, admin_headers, user_loan, assert_max_queries):
+    from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version
+    bump_cache_version(PENDING_LOANS_CACHE)
+    db.session.commit()
+    
+    first = client.get('/api/admin/loans/pending', headers=admin_headers)
+    assert first.status_code == 200
+    
+    # Only the version lookup
+    with assert_max_queries(1):
+        cached = client.get('/api/admin/loans/pending', headers=admin_headers)
+    
+    assert cached.get_data() == first.get_data()
+    
+    # A write committed elsewhere (e.g. another worker) only touches the
+    # version row, yet this worker must stop serving the old payload
+    loan = Loan.query.get(user_loan)
+    db.session.add(Loan(user_id=loan.user_id, amount=500, purpose='From another worker', status=Loan.PENDING))
+    bump_cache_version(PENDING_LOANS_CACHE)
+    db.session.commit()
+    
+    response = client.get('/api/admin/loans/pending', headers=admin_headers)
+    assert len(response.get_json()['loans']) == 2
+
+def test_cache_version_bumped_after_commit_only(client):
+    from utils.response_cache import PENDING_LOANS_CACHE, bump_cache_version, get_cache_version
+    
+    bump_cache_version(PENDING_LOANS_CACHE)
+    db.session.rollback()
+    assert get_cache_version(PENDING_LOANS_CACHE) is None
+    
+    bump_cache_version(PENDING_LOANS_CACHE)
+    # The writer's transaction never touches (or locks) the version row
+    assert get_cache_version(PENDING_LOANS_CACHE) is None
+    db.session.commit()
+    first = get_cache_version(PENDING_LOANS_CACHE)
+    assert first is not None
+    
+    bump_cache_version(PENDING_LOANS_CACHE)
+    db.session.commit()
+    assert get_cache_version(PENDING_LOANS_CACHE) == first + 1
+
+def test_pending_queue_cache_invalidated_by_decisions(client, admin_headers, user_loan):
+    response = client.get('/api/admin/loans/pending', headers=admin_headers)
+    assert len(response.get_json()['loans']) == 1
+    
+    client.post(f'/api/admin/loans/{user_loan}/approve', headers=admin_headers, json={})
+    response = client.get('/api/admin/loans/pending', headers=admin_headers)
+    assert response.get_json()['loans'] == []
+    
+    loan = Loan.query.get(user_loan)
+    from utils.auth_tokens import create_user_token
+    user_headers = {'Authorization': f'Bearer {create_user_token(loan.user)}'}
+    client.post('/api/loans', headers=user_headers, json={'amount': 1000, 'purpose': 'Another loan'})
+    response = client.get('/api/admin/loans/pending', headers=admin_headers)
+    assert [l['purpose'] for l in response.get_json()['loans']] == ['Another loan']
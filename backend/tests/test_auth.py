@@ -81,3 +81,151 @@ def test_get_current_user(client, auth_headers):
     data = response.get_json()
     assert data['user']['username'] == 'testuser'
 
+
+@pytest.fixture
+def stateless_otp(client, monkeypatch):
+    """Switch to stateless login OTPs and capture the OTPs that would be emailed"""
+    import routes.auth
+    monkeypatch.setitem(app.config, 'LOGIN_OTP_MODE', 'stateless')
+    sent = []
+    monkeypatch.setattr(routes.auth, 'send_otp_email', lambda email, otp, username, is_login=False: sent.append(otp) or True)
+    
+    user = User(username='otpuser', email='otp@example.com', role='user')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return sent
+
+def test_stateless_login_otp(client, stateless_otp):
+    from models import PendingLogin
+    
+    response = client.post('/api/auth/login', json={'username': 'otpuser', 'password': 'password123'})
+    assert response.status_code == 200
+    challenge = response.get_json()['pending_login_id']
+    assert PendingLogin.query.count() == 0
+    
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge, 'otp': stateless_otp[-1]})
+    assert response.status_code == 200
+    assert response.get_json()['user']['username'] == 'otpuser'
+    assert 'access_token' in response.get_json()
+    
+    # The same challenge can't be used twice
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge, 'otp': stateless_otp[-1]})
+    assert response.status_code == 400
+
+def test_stateless_login_rejects_wrong_otp_and_tampered_challenge(client, stateless_otp):
+    response = client.post('/api/auth/login', json={'username': 'otpuser', 'password': 'password123'})
+    challenge = response.get_json()['pending_login_id']
+    wrong_otp = '000000' if stateless_otp[-1] != '000000' else '111111'
+    
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge, 'otp': wrong_otp})
+    assert response.status_code == 400
+    
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge[:-2] + 'xx', 'otp': stateless_otp[-1]})
+    assert response.status_code == 400
+
+def test_stateless_resend_invalidates_previous_challenge(client, stateless_otp):
+    response = client.post('/api/auth/login', json={'username': 'otpuser', 'password': 'password123'})
+    first_challenge = response.get_json()['pending_login_id']
+    first_otp = stateless_otp[-1]
+    
+    response = client.post('/api/auth/resend-login-otp', json={'pending_login_id': first_challenge})
+    assert response.status_code == 200
+    second_challenge = response.get_json()['pending_login_id']
+    
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': first_challenge, 'otp': first_otp})
+    assert response.status_code == 400
+    
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': second_challenge, 'otp': stateless_otp[-1]})
+    assert response.status_code == 200
+
+def test_stateless_challenge_is_used_up_by_wrong_otps(client, stateless_otp):
+    from utils.otp_challenge import MAX_OTP_ATTEMPTS
+    response = client.post('/api/auth/login', json={'username': 'otpuser', 'password': 'password123'})
+    challenge = response.get_json()['pending_login_id']
+    wrong_otp = '000000' if stateless_otp[-1] != '000000' else '111111'
+    
+    for _ in range(MAX_OTP_ATTEMPTS):
+        response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge, 'otp': wrong_otp})
+        assert response.status_code == 400
+    
+    # Guessing is over: even the right OTP no longer works
+    response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': challenge, 'otp': stateless_otp[-1]})
+    assert response.status_code == 400
+
+def test_pending_login_is_deleted_after_too_many_wrong_otps(client, monkeypatch):
+    import routes.auth
+    from models import PendingLogin
+    from utils.otp_challenge import MAX_OTP_ATTEMPTS
+    monkeypatch.setattr(routes.auth, 'send_otp_email', lambda email, otp, username, is_login=False: True)
+    user = User(username='otpuser', email='otp@example.com', role='user')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    
+    pending_login_id = client.post('/api/auth/login', json={'username': 'otpuser', 'password': 'password123'}).get_json()['pending_login_id']
+    wrong_otp = '000000' if PendingLogin.query.get(pending_login_id).otp != '000000' else '111111'
+    
+    for _ in range(MAX_OTP_ATTEMPTS):
+        response = client.post('/api/auth/verify-login-otp', json={'pending_login_id': pending_login_id, 'otp': wrong_otp})
+        assert response.status_code == 400
+    
+    assert PendingLogin.query.get(pending_login_id) is None
+
+@pytest.fixture
+def reset_otps(client, monkeypatch):
+    """Capture password reset OTPs instead of emailing them"""
+    import routes.auth
+    sent = []
+    monkeypatch.setattr(routes.auth, 'send_password_reset_otp', lambda email, otp, username: sent.append(otp) or True)
+    
+    user = User(username='resetuser', email='reset@example.com', role='user')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return sent
+
+def test_password_reset_stores_only_token_hash(client, reset_otps):
+    from models import PasswordReset
+    from utils.auth_tokens import clear_token_version_cache
+    
+    response = client.post('/api/auth/forgot-password', json={'email': 'reset@example.com'})
+    reset_id = response.get_json()['reset_id']
+    response = client.post('/api/auth/forgot-password/verify', json={'reset_id': reset_id, 'otp': reset_otps[-1]})
+    assert response.status_code == 200
+    reset_token = response.get_json()['reset_token']
+    
+    stored = PasswordReset.query.get(int(reset_id))
+    assert stored.reset_token_hash == PasswordReset.hash_reset_token(reset_token)
+    assert reset_token not in stored.reset_token_hash
+    
+    # The hash itself is not a usable token
+    response = client.post('/api/auth/forgot-password/reset', json={
+        'reset_token': stored.reset_token_hash, 'new_password': 'newpassword123'
+    })
+    assert response.status_code == 400
+    
+    try:
+        response = client.post('/api/auth/forgot-password/reset', json={
+            'reset_token': reset_token, 'new_password': 'newpassword123'
+        })
+        assert response.status_code == 200
+        
+        response = client.post('/api/auth/forgot-password/reset', json={
+            'reset_token': reset_token, 'new_password': 'anotherpassword123'
+        })
+        assert response.status_code == 400
+    finally:
+        # The reset revoked this user's tokens; don't leak that into later tests
+        clear_token_version_cache()
+
+def test_email_lookups_are_case_insensitive(client, reset_otps):
+    response = client.post('/api/auth/forgot-password', json={'email': '  Reset@Example.COM '})
+    assert response.status_code == 200
+    assert 'reset_id' in response.get_json()
+    
+    response = client.post('/api/auth/register', json={
+        'username': 'someoneelse', 'email': 'RESET@example.com', 'password': 'password123'
+    })
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Email already exists'
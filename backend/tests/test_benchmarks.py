@@ -0,0 +1,17 @@
+from benchmarks.bench_endpoints import compare, percentile
+
+def results(p95_ms, queries):
+    return {'scenarios': {'admin_pending_queue': {'p95_ms': p95_ms, 'queries_per_request': queries}}}
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) is None
+
+def test_compare_flags_slowdown_beyond_threshold():
+    assert compare(results(11.9, 1), results(10.0, 1), threshold=0.2) == []
+    assert compare(results(12.5, 1), results(10.0, 1), threshold=0.2) == ['admin_pending_queue: p95 10.0ms -> 12.5ms']
+
+def test_compare_flags_extra_queries():
+    assert compare(results(10.0, 2), results(10.0, 1), threshold=0.2) == ['admin_pending_queue: queries/request 1 -> 2']
@@ -0,0 +1,61 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, exc
+from utils.db_pool import InstrumentedQueuePool, engine_options, warm_pool
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                           pool_size=2, max_overflow=1, pool_timeout=0.1)
+    engine.pool.metrics_name = 'test'
+    yield engine
+    engine.dispose()
+
+def test_engine_options_from_profile_and_overrides():
+    assert engine_options('sqlite:///loan_management.db', {}) == {}
+    
+    options = engine_options('postgresql://db/loans', {})
+    assert options['pool_size'] == 5
+    assert options['pool_pre_ping'] is True
+    assert options['poolclass'] is InstrumentedQueuePool
+    
+    options = engine_options('mysql+pymysql://db/loans', {
+        'DB_POOL_PROFILE': 'small', 'DB_MAX_OVERFLOW': '0', 'DB_POOL_PRE_PING': 'false'
+    })
+    assert (options['pool_size'], options['max_overflow'], options['pool_recycle']) == (2, 0, 280)
+    assert options['pool_pre_ping'] is False
+    
+    with pytest.raises(ValueError, match='DB_POOL_PROFILE'):
+        engine_options('postgresql://db/loans', {'DB_POOL_PROFILE': 'huge'})
+
+def test_pool_reports_usage_and_timeouts(engine):
+    def sample(name):
+        return REGISTRY.get_sample_value(name, {'pool': 'test'}) or 0
+    
+    timeouts = sample('db_pool_timeouts_total')
+    waits = sample('db_pool_checkout_wait_seconds_count')
+    connections = [engine.connect() for _ in range(3)]
+    try:
+        assert engine.pool.stats()['checked_out'] == 3
+        assert sample('db_pool_checked_out_connections') == 3
+        assert sample('db_pool_overflow_connections') == 1
+        
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        assert sample('db_pool_timeouts_total') == timeouts + 1
+        assert sample('db_pool_checkout_wait_seconds_count') == waits + 4
+    finally:
+        for connection in connections:
+            connection.close()
+    
+    assert sample('db_pool_checked_out_connections') == 0
+    
+    # Disposing swaps in a new pool under the same label
+    engine.dispose()
+    assert engine.pool.metrics_name == 'test'
+
+def test_warm_pool_opens_connections_up_front(engine):
+    assert engine.pool.checkedin() == 0
+    assert warm_pool(engine, 5) == 2
+    stats = engine.pool.stats()
+    assert (stats['checked_in'], stats['checked_out']) == (2, 0)
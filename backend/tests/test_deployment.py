@@ -0,0 +1,70 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import pytest
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class RecordingHandler:
+    def __init__(self):
+        self.recipients = []
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+@pytest.mark.skipif(shutil.which('gunicorn') is None, reason='gunicorn not installed')
+def test_gunicorn_workers_send_queued_loan_emails(tmp_path):
+    """Run the app the way Procfile/railway.json do and check the outbox is drained"""
+    handler = RecordingHandler()
+    smtp = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=free_port())
+    smtp.start()
+    
+    env = dict(
+        os.environ,
+        DATABASE_URL=f'sqlite:///{tmp_path}/app.db',
+        PROMETHEUS_MULTIPROC_DIR=str(tmp_path / 'metrics'),
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=str(smtp.port),
+        MAIL_USE_TLS='False',
+        MAIL_USERNAME='lms@test.com',
+        MAIL_PASSWORD=''
+    )
+    # An approval email queued by a request handler, waiting in the outbox
+    queue = (
+        "from app import app\n"
+        "from db import db\n"
+        "from utils.email_outbox import queue_email\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    queue_email('borrower@test.com', 'Loan approved', 'Body')\n"
+        "    db.session.commit()\n"
+    )
+    (tmp_path / 'metrics').mkdir()
+    subprocess.run([sys.executable, '-c', queue], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+    
+    server = subprocess.Popen(
+        ['gunicorn', '--bind', f'127.0.0.1:{free_port()}', '--workers', '2', '--timeout', '120', 'app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while not handler.recipients and time.monotonic() < deadline:
+            time.sleep(0.2)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        smtp.stop()
+    
+    # Sent exactly once, although both workers run the dispatcher
+    assert handler.recipients == ['borrower@test.com']
@@ -0,0 +1,107 @@
+import pytest
+from app import app
+from db import db
+from models import EmailOutbox
+from datetime import datetime, timedelta
+from utils import email_outbox
+from utils.email_outbox import queue_email, dispatch_email_outbox
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+def test_dispatch_sends_pending_emails_in_batches(client, monkeypatch):
+    sent = []
+    batches = []
+    def fake_send_many(emails):
+        batches.append(len(emails))
+        sent.extend(recipient for recipient, _, _ in emails)
+        return [None] * len(emails)
+    monkeypatch.setattr(email_outbox, 'send_many', fake_send_many)
+    for i in range(5):
+        queue_email(f'user{i}@test.com', 'Subject', 'Body')
+    db.session.commit()
+    
+    assert dispatch_email_outbox(app, batch_size=2) == 5
+    
+    assert sorted(sent) == [f'user{i}@test.com' for i in range(5)]
+    assert batches == [2, 2, 1]
+    db.session.expire_all()
+    assert all(entry.status == EmailOutbox.SENT for entry in EmailOutbox.query.all())
+
+def test_dispatch_retries_with_backoff_then_gives_up(client, monkeypatch):
+    def failing_send_many(emails):
+        return [ConnectionError('SMTP down')] * len(emails)
+    monkeypatch.setattr(email_outbox, 'send_many', failing_send_many)
+    entry = queue_email('user@test.com', 'Subject', 'Body')
+    entry.max_attempts = 2
+    db.session.commit()
+    
+    assert dispatch_email_outbox(app) == 0
+    db.session.expire_all()
+    entry = EmailOutbox.query.get(entry.id)
+    assert entry.status == EmailOutbox.PENDING
+    assert entry.attempts == 1
+    assert entry.last_error == 'SMTP down'
+    assert entry.next_attempt_at > datetime.utcnow() + timedelta(seconds=20)
+    
+    # Not due yet, so nothing is attempted
+    assert dispatch_email_outbox(app) == 0
+    db.session.expire_all()
+    assert EmailOutbox.query.get(entry.id).attempts == 1
+    
+    entry.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    dispatch_email_outbox(app)
+    db.session.expire_all()
+    entry = EmailOutbox.query.get(entry.id)
+    assert entry.status == EmailOutbox.FAILED
+    assert entry.attempts == 2
+
+def test_dispatch_skips_when_email_not_configured(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAIL_USERNAME', '')
+    entry = queue_email('user@test.com', 'Subject', 'Body')
+    db.session.commit()
+    
+    assert dispatch_email_outbox(app) == 0
+    db.session.expire_all()
+    assert EmailOutbox.query.get(entry.id).status == EmailOutbox.SKIPPED
+
+def test_claimed_emails_are_not_claimed_again(client):
+    for i in range(3):
+        queue_email(f'user{i}@test.com', 'Subject', 'Body')
+    db.session.commit()
+    
+    first = email_outbox.claim_due_emails(batch_size=2)
+    # A second dispatcher (another worker) only gets what is left
+    second = email_outbox.claim_due_emails(batch_size=10)
+    
+    assert len(first) == 2
+    assert all(entry.status == EmailOutbox.SENDING for entry in first)
+    assert [entry.recipient for entry in second] == ['user2@test.com']
+    assert email_outbox.claim_due_emails() == []
+
+def test_dispatch_retries_claims_left_by_a_dead_dispatcher(client, monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_outbox, 'send_many', lambda emails: sent.extend(emails) or [None] * len(emails))
+    stale = queue_email('stale@test.com', 'Subject', 'Body')
+    fresh = queue_email('fresh@test.com', 'Subject', 'Body')
+    db.session.commit()
+    email_outbox.claim_due_emails()
+    stale.claimed_at = datetime.utcnow() - email_outbox.CLAIM_TIMEOUT - timedelta(seconds=1)
+    db.session.commit()
+    
+    # Only the claim that timed out is picked up again
+    assert dispatch_email_outbox(app) == 1
+    assert [recipient for recipient, _, _ in sent] == ['stale@test.com']
+    db.session.expire_all()
+    assert EmailOutbox.query.get(stale.id).status == EmailOutbox.SENT
+    assert EmailOutbox.query.get(fresh.id).status == EmailOutbox.SENDING
@@ -0,0 +1,34 @@
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from app import app
+from utils.json_provider import OrjsonJSONProvider, StdlibJSONProvider, orjson
+
+PAYLOAD = {
+    'b': [1, 2.5, None, True],
+    'a': {'created_at': datetime(2026, 1, 2, 3, 4, 5, 678), 'dob': date(1990, 1, 1)},
+    'amount': Decimal('1234.50'),
+    'name': 'Zoë'
+}
+
+def test_stdlib_provider_uses_iso_dates_and_string_decimals():
+    data = json.loads(StdlibJSONProvider(app).dumps(PAYLOAD))
+    assert data['a'] == {'created_at': '2026-01-02T03:04:05.000678', 'dob': '1990-01-01'}
+    assert data['amount'] == '1234.50'
+
+@pytest.mark.skipif(orjson is None, reason='orjson not installed')
+def test_orjson_response_matches_stdlib():
+    with app.app_context():
+        stdlib = StdlibJSONProvider(app).response(PAYLOAD).get_data()
+        fast = OrjsonJSONProvider(app).response(PAYLOAD).get_data()
+    assert json.loads(fast) == json.loads(stdlib)
+    # Same key order and compact layout, only non-ASCII is left unescaped
+    assert fast.decode() == stdlib.decode().replace('\\u00eb', 'ë')
+
+def test_benchmark_runs_for_each_backend():
+    from benchmarks.bench_serialization import parse_args, run_benchmarks
+    results = run_benchmarks(parse_args(['--rows', '20', '--iterations', '2']))
+    assert 'stdlib' in results['backends']
+    sizes = {backend['body_bytes'] for backend in results['backends'].values()}
+    assert len(sizes) == 1
@@ -0,0 +1,41 @@
+import pytest
+from datetime import datetime
+from app import app
+from db import db
+from models import User, Loan
+from utils.loan_queries import loan_row_to_dict, select_loans
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+def test_rows_serialize_exactly_like_to_dict(client):
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('admin123')
+    borrower = User(username='borrower', email='borrower@test.com', role='user', profile_completed=True)
+    borrower.set_password('test123')
+    db.session.add_all([admin, borrower])
+    db.session.flush()
+    db.session.add_all([
+        Loan(user_id=borrower.id, amount=1234.56, purpose='Pending loan', status=Loan.PENDING),
+        Loan(user_id=borrower.id, amount=500, purpose='Rejected loan', status=Loan.REJECTED,
+             rejection_reason=Loan.REASON_EXCEEDS_LIMIT, admin_notes='Too much',
+             reviewed_at=datetime(2026, 1, 2, 3, 4, 5), reviewed_by=admin.id)
+    ])
+    db.session.commit()
+    
+    for include_user in (False, True):
+        rows = db.session.execute(select_loans(include_user).order_by(Loan.id)).all()
+        expected = [loan.to_dict(include_user=include_user) for loan in Loan.query.order_by(Loan.id)]
+        actual = [loan_row_to_dict(row, include_user) for row in rows]
+        assert actual == expected
+        # Key order is part of the serialized output
+        assert [list(d) for d in actual] == [list(d) for d in expected]
@@ -108,3 +108,112 @@ def test_get_loan_by_id(client, user_with_profile):
     data = response.get_json()
     assert data['loan']['id'] == loan_id
 
+
+@pytest.fixture
+def claims_user(client):
+    """User created directly, with a token issued before the profile was completed"""
+    from utils.auth_tokens import create_user_token
+    user = User(username='claimsuser', email='claims@example.com', role='user')
+    user.set_password('testpass123')
+    db.session.add(user)
+    db.session.commit()
+    return user, {'Authorization': f'Bearer {create_user_token(user)}'}
+
+def test_stale_profile_claim_falls_back_to_database(client, claims_user):
+    user, headers = claims_user
+    
+    response = client.post('/api/loans', headers=headers, json={'amount': 1000, 'purpose': 'Test loan'})
+    assert response.status_code == 400
+    
+    user.profile_completed = True
+    db.session.commit()
+    
+    response = client.post('/api/loans', headers=headers, json={'amount': 1000, 'purpose': 'Test loan'})
+    assert response.status_code == 201
+
+def test_user_role_claim_cannot_reach_admin_routes(client, claims_user):
+    _, headers = claims_user
+    response = client.get('/api/admin/loans/pending', headers=headers)
+    assert response.status_code == 403
+
+def test_token_identity_not_reused_across_requests(client, claims_user):
+    from utils.auth_tokens import create_user_token
+    admin = User(username='admin', email='admin@example.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.commit()
+    admin_headers = {'Authorization': f'Bearer {create_user_token(admin)}'}
+    _, user_headers = claims_user
+    
+    # Both requests run inside the fixture's app context, sharing g
+    assert client.get('/api/admin/loans/pending', headers=admin_headers).status_code == 200
+    assert client.get('/api/admin/loans/pending', headers=user_headers).status_code == 403
+
+def test_get_loans_answers_if_none_match_with_304(client, claims_user, assert_max_queries):
+    user, _ = claims_user
+    user.profile_completed = True
+    loan = Loan(user_id=user.id, amount=1000, purpose='Test loan', status=Loan.PENDING)
+    db.session.add(loan)
+    db.session.commit()
+    from utils.auth_tokens import create_user_token
+    headers = {'Authorization': f'Bearer {create_user_token(user)}'}
+    
+    response = client.get('/api/loans', headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    
+    # Only the borrower's own aggregate version query runs
+    with assert_max_queries(1):
+        response = client.get('/api/loans', headers={**headers, 'If-None-Match': etag})
+    
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    
+    # Another page of the same list gets its own tag
+    response = client.get('/api/loans?limit=10', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    
+    loan.status = Loan.APPROVED
+    db.session.commit()
+    response = client.get('/api/loans', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['loans'][0]['status'] == Loan.APPROVED
+
+def test_admin_loan_list_etag_comes_from_the_version_row(client, claims_user):
+    from utils.auth_tokens import create_user_token
+    from utils.query_counter import track_queries
+    borrower, _ = claims_user
+    borrower.profile_completed = True
+    admin = User(username='etagadmin', email='etagadmin@example.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.commit()
+    borrower_headers = {'Authorization': f'Bearer {create_user_token(borrower)}'}
+    admin_headers = {'Authorization': f'Bearer {create_user_token(admin)}'}
+    
+    # No version row yet: nothing to vouch for the list, so no ETag
+    response = client.get('/api/loans?limit=50', headers=admin_headers)
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    
+    # Creating a loan bumps the version
+    assert client.post('/api/loans', headers=borrower_headers,
+                       json={'amount': 1000, 'purpose': 'Test loan'}).status_code == 201
+    response = client.get('/api/loans?limit=50', headers=admin_headers)
+    etag = response.headers['ETag']
+    
+    with track_queries() as stats:
+        response = client.get('/api/loans?limit=50', headers={**admin_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    # One primary-key read of the version row, no scan of loans
+    assert stats.count == 1
+    assert 'cache_versions' in stats.statements[0]
+    assert 'loans' not in stats.statements[0]
+    
+    loan_id = client.get('/api/loans?limit=50', headers=admin_headers).get_json()['loans'][0]['id']
+    assert client.post(f'/api/admin/loans/{loan_id}/approve', headers=admin_headers, json={}).status_code == 200
+    response = client.get('/api/loans?limit=50', headers={**admin_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['loans'][0]['status'] == Loan.APPROVED
@@ -0,0 +1,112 @@
+import socket
+import time
+import pytest
+from flask_mail import Connection, Mail, Message
+from app import app
+from utils.mail_transport import MailConnectionPool
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+class CountingHandler:
+    """Local SMTP stand-in that records sessions and delivered messages"""
+    
+    def __init__(self):
+        self.sessions = 0
+        self.messages = []
+    
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.rcpt_tos)
+        return '250 OK'
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    
+    handler = CountingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+@pytest.fixture
+def mail_state(smtp_server):
+    _, port = smtp_server
+    config = {
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': port,
+        'MAIL_USE_TLS': False,
+        'MAIL_SUPPRESS_SEND': False
+    }
+    with app.app_context():
+        yield Mail().init_mail(config)
+
+def make_messages(count):
+    return [Message(subject=f'Message {i}', recipients=[f'user{i}@test.com'], body='Body', sender='lms@test.com')
+            for i in range(count)]
+
+def test_send_many_uses_one_session(smtp_server, mail_state):
+    handler, _ = smtp_server
+    pool = MailConnectionPool(mail_state)
+    
+    results = pool.send_many(make_messages(20))
+    
+    assert results == [None] * 20
+    assert len(handler.messages) == 20
+    assert handler.sessions == 1
+    pool.close_all()
+
+def test_pooled_sends_reuse_session(smtp_server, mail_state):
+    handler, _ = smtp_server
+    pool = MailConnectionPool(mail_state)
+    
+    for message in make_messages(5):
+        pool.send(message)
+    
+    assert len(handler.messages) == 5
+    assert handler.sessions == 1
+    pool.close_all()
+
+def test_dropped_session_is_reopened(smtp_server, mail_state):
+    handler, _ = smtp_server
+    pool = MailConnectionPool(mail_state)
+    pool.send(make_messages(1)[0])
+    
+    # Simulate the server closing the idle session
+    connection, _ = pool._idle[0]
+    connection.host.close()
+    
+    results = pool.send_many(make_messages(3))
+    
+    assert results == [None] * 3
+    assert len(handler.messages) == 4
+    assert handler.sessions == 2
+    pool.close_all()
+
+def test_pooled_vs_per_message_throughput(smtp_server, mail_state):
+    handler, _ = smtp_server
+    count = 50
+    
+    # What mail.send() does: a fresh SMTP session per message
+    start = time.perf_counter()
+    for message in make_messages(count):
+        with Connection(mail_state) as connection:
+            connection.send(message)
+    unpooled_rate = count / (time.perf_counter() - start)
+    assert handler.sessions == count
+    
+    pool = MailConnectionPool(mail_state)
+    start = time.perf_counter()
+    pool.send_many(make_messages(count))
+    pooled_rate = count / (time.perf_counter() - start)
+    pool.close_all()
+    
+    print(f"\nSMTP throughput: {unpooled_rate:.0f} msg/s per-message connections, {pooled_rate:.0f} msg/s pooled")
+    assert handler.sessions == count + 1
+    assert len(handler.messages) == 2 * count
@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+import pytest
+from app import app
+from db import db
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+def sample_value(text, name, **labels):
+    """Find a sample in Prometheus text output by metric name and labels"""
+    for line in text.splitlines():
+        if line.startswith(name + '{') and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+def test_metrics_record_latency_status_and_queries(client):
+    client.get('/api/admin/rejection-reasons')
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    
+    assert sample_value(text, 'http_requests_total', blueprint='admin', endpoint='admin.get_rejection_reasons', status='401') >= 1
+    assert sample_value(text, 'http_request_duration_seconds_count', blueprint='admin', endpoint='admin.get_rejection_reasons') >= 1
+    assert sample_value(text, 'http_request_db_queries_count', endpoint='admin.get_rejection_reasons') >= 1
+
+def test_unmatched_urls_share_one_label(client):
+    client.get('/no-such-page-1')
+    client.get('/no-such-page-2')
+    
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample_value(text, 'http_requests_total', endpoint='unmatched', status='404') >= 2
+    assert 'no-such-page' not in text
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    hit = "from app import app; app.test_client().get('/')"
+    scrape = "from app import app; print(app.test_client().get('/metrics').get_data(as_text=True))"
+    
+    # Two separate "workers" each serve one request
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', hit], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+    result = subprocess.run([sys.executable, '-c', scrape], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True)
+    
+    assert sample_value(result.stdout, 'http_requests_total', endpoint='index', status='200') == 2
+
+def test_metrics_refuse_other_addresses(client):
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 403
+    assert 'http_requests_total' not in response.get_data(as_text=True)
+
+def test_metrics_allow_listed_network(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_ALLOWED_IPS', '10.0.0.0/8, ::1')
+    
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+    assert client.get('/metrics').status_code == 403
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+    outside = {'REMOTE_ADDR': '203.0.113.7'}
+    
+    assert client.get('/metrics', environ_base=outside).status_code == 401
+    assert client.get('/metrics', environ_base=outside, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', environ_base=outside, headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
@@ -0,0 +1,84 @@
+import threading
+import pytest
+from app import app
+from db import db
+from models import User
+from werkzeug.security import generate_password_hash
+from utils.metrics import render_metrics
+from utils.password_hashing import PasswordHasher, PasswordHashingBusy
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def hasher(monkeypatch):
+    """Cheap pbkdf2 hasher installed as the app's hasher"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:2000', max_workers=1, max_pending=1)
+    monkeypatch.setitem(app.extensions, 'password_hasher', hasher)
+    return hasher
+
+def test_outdated_hash_is_upgraded_on_login(client, hasher):
+    admin = User(username='admin', email='admin@test.com', role='admin',
+                 password_hash=generate_password_hash('admin123', 'pbkdf2:sha256:1000'))
+    db.session.add(admin)
+    db.session.commit()
+    
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200
+    
+    db.session.refresh(admin)
+    assert admin.password_hash.startswith('pbkdf2:sha256:2000$')
+    assert not hasher.needs_rehash(admin.password_hash)
+    assert admin.check_password('admin123')
+    
+    # Logging in again leaves the current hash alone
+    current_hash = admin.password_hash
+    client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    db.session.refresh(admin)
+    assert admin.password_hash == current_hash
+
+def test_full_queue_refuses_instead_of_waiting(hasher):
+    started = threading.Event()
+    release = threading.Event()
+    
+    def slow_hash():
+        started.set()
+        release.wait(5)
+    
+    # One running on the pool and one waiting fill max_workers + max_pending
+    running = threading.Thread(target=hasher._run, args=('hash', slow_hash))
+    waiting = threading.Thread(target=hasher._run, args=('hash', slow_hash))
+    running.start()
+    started.wait(5)
+    waiting.start()
+    try:
+        with pytest.raises(PasswordHashingBusy):
+            hasher._run('hash', slow_hash)
+    finally:
+        release.set()
+        running.join(5)
+        waiting.join(5)
+    
+    # Slots are handed back once the work finishes
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert b'password_hash_rejected_total' in render_metrics()
+    assert b'password_hash_duration_seconds_count{operation="verify"}' in render_metrics()
+
+def test_login_returns_503_when_hashing_is_saturated(client, hasher, monkeypatch):
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.commit()
+    
+    monkeypatch.setattr(hasher._slots, 'acquire', lambda blocking=True: False)
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 503
@@ -0,0 +1,68 @@
+import pytest
+from app import app
+from db import db
+from models import User
+from utils.auth_tokens import create_user_token
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def user_headers(client):
+    user = User(username='profileuser', email='profile@test.com', role='user')
+    user.set_password('test123')
+    db.session.add(user)
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_user_token(user)}'}
+
+PROFILE_DATA = {
+    'first_name': 'Test',
+    'last_name': 'User',
+    'phone': '1234567890',
+    'address': '123 Test St',
+    'date_of_birth': '1990-01-01',
+    'employment_status': 'Employed',
+    'annual_income': 50000
+}
+
+def test_get_profile_etag_changes_when_profile_saved(client, user_headers):
+    response = client.get('/api/profile', headers=user_headers)
+    assert response.status_code == 200
+    assert response.get_json()['profile'] is None
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/profile', headers={**user_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    response = client.post('/api/profile', headers=user_headers, json=PROFILE_DATA)
+    assert response.status_code == 200
+    
+    response = client.get('/api/profile', headers={**user_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['profile']['first_name'] == 'Test'
+    assert response.headers['ETag'] != etag
+
+def test_get_current_user_answers_if_none_match_with_304(client, user_headers):
+    response = client.get('/api/auth/me', headers=user_headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/auth/me', headers={**user_headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    user = User.query.filter_by(username='profileuser').first()
+    user.profile_completed = True
+    db.session.commit()
+    
+    response = client.get('/api/auth/me', headers={**user_headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['user']['profile_completed'] is True
@@ -0,0 +1,73 @@
+import pytest
+from app import app
+from db import db
+from models import User, Loan
+from utils.query_counter import statement_shape, track_queries
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def borrowers_with_loans(client):
+    for i in range(6):
+        borrower = User(username=f'borrower{i}', email=f'borrower{i}@example.com', role='user',
+                        password_hash='x')
+        db.session.add(borrower)
+        db.session.flush()
+        db.session.add(Loan(user_id=borrower.id, amount=1000, purpose='Test loan', status=Loan.PENDING))
+    db.session.commit()
+    db.session.expunge_all()
+
+def test_statement_shape_ignores_parameters():
+    assert statement_shape('SELECT * FROM users WHERE id IN (?, ?, ?)') == \
+        statement_shape('SELECT *\n  FROM users WHERE id IN (?)')
+    assert statement_shape('SELECT * FROM loans LIMIT 20') == statement_shape('SELECT * FROM loans LIMIT 50')
+    assert statement_shape('SELECT * FROM users WHERE id IN (%(id_1_1)s, %(id_1_2)s)') == \
+        'SELECT * FROM users WHERE id IN (?)'
+    assert statement_shape('SELECT * FROM users') != statement_shape('SELECT * FROM loans')
+
+def test_lazy_loads_in_a_loop_are_flagged(borrowers_with_loans):
+    with track_queries() as stats:
+        [loan.to_dict(include_user=True) for loan in Loan.query.all()]
+    
+    # One query for the loans, then one lazy load of loan.user per row
+    assert stats.count == 7
+    [(shape, count)] = stats.repeated().items()
+    assert count == 6
+    assert 'FROM users' in shape
+
+def test_assert_max_queries_reports_statements(borrowers_with_loans, assert_max_queries):
+    with pytest.raises(AssertionError, match='Likely N\\+1'):
+        with assert_max_queries(10):
+            [loan.user for loan in Loan.query.all()]
+    
+    with pytest.raises(AssertionError, match='7 SQL statements, expected at most 3') as excinfo:
+        with assert_max_queries(3, allow_repeated=True):
+            [loan.user for loan in Loan.query.all()]
+    assert '6x SELECT' in str(excinfo.value)
+
+def test_debug_headers(client, monkeypatch):
+    response = client.get('/api/admin/rejection-reasons')
+    assert 'X-Query-Count' not in response.headers
+    
+    monkeypatch.setitem(app.config, 'QUERY_STATS_HEADERS', True)
+    admin = User(username='admin', email='admin@test.com', role='admin', password_hash='x')
+    db.session.add(admin)
+    db.session.commit()
+    from utils.auth_tokens import create_user_token
+    headers = {'Authorization': f'Bearer {create_user_token(admin)}'}
+    
+    response = client.get('/api/admin/loans/pending', headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) >= 1
+    assert float(response.headers['X-Query-Time-Ms']) >= 0
+    assert response.headers['X-Query-Repeated'] == '0'
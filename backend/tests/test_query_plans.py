@@ -0,0 +1,89 @@
+import pytest
+from app import app
+from db import db
+from models import Loan, PendingRegistration, PendingLogin, PasswordReset
+from datetime import datetime, timedelta
+from sqlalchemy import Select, text
+from utils.loan_queries import select_loans
+from utils.pagination import keyset_page_query
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+def query_plan(query):
+    """Return the SQLite EXPLAIN QUERY PLAN details for an ORM query or Core select()"""
+    statement = query if isinstance(query, Select) else query.statement
+    compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+# A cursor from a previous page, so plans include the (created_at, id) predicate
+CURSOR = (datetime(2026, 1, 1), 500)
+
+def test_pending_queue_page_uses_status_created_at_index(client):
+    # Same statement as GET /api/admin/loans/pending?cursor=...
+    query = keyset_page_query(select_loans(include_user=True).where(Loan.status == Loan.PENDING),
+                              Loan, 50, CURSOR, descending=False)
+    plan = query_plan(query)
+    assert 'ix_loans_status_created_at (status=? AND created_at>?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_admin_loans_page_uses_created_at_id_index(client):
+    # Same statement as GET /api/loans?cursor=... for an admin
+    query = keyset_page_query(select_loans(include_user=True), Loan, 50, CURSOR)
+    plan = query_plan(query)
+    assert 'ix_loans_created_at_id (created_at<?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_user_loans_page_uses_user_id_created_at_index(client):
+    # Same statement as GET /api/loans?cursor=... for a borrower
+    query = keyset_page_query(select_loans().where(Loan.user_id == 1), Loan, 50, CURSOR)
+    plan = query_plan(query)
+    assert 'ix_loans_user_id_created_at (user_id=? AND created_at<?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_unpaginated_lists_use_the_same_indexes(client):
+    pending = select_loans(include_user=True).where(Loan.status == Loan.PENDING).order_by(Loan.created_at.asc())
+    assert 'ix_loans_status_created_at' in query_plan(pending)
+    own = select_loans().where(Loan.user_id == 1).order_by(Loan.created_at.desc())
+    assert 'ix_loans_user_id_created_at' in query_plan(own)
+    assert 'TEMP B-TREE' not in query_plan(own)
+
+def test_auto_reject_scan_uses_status_created_at_index(client):
+    # Same statement as one chunk of scheduler._auto_reject_in_chunks
+    cutoff = datetime.utcnow() - timedelta(days=5)
+    query = db.session.query(Loan.id).filter(
+        Loan.status == Loan.PENDING,
+        Loan.created_at <= cutoff
+    ).order_by(Loan.created_at, Loan.id).limit(500)
+    plan = query_plan(query)
+    assert 'ix_loans_status_created_at' in plan
+    assert 'created_at<' in plan.replace(' ', '')
+    assert 'TEMP B-TREE' not in plan
+
+def test_auth_lookups_use_indexes(client):
+    assert 'ix_pending_registrations_email' in query_plan(PendingRegistration.query.filter_by(email='a@test.com'))
+    assert 'ix_pending_logins_user_id' in query_plan(PendingLogin.query.filter_by(user_id=1))
+    assert 'ix_password_resets_user_id' in query_plan(PasswordReset.query.filter_by(user_id=1))
+    assert 'ix_password_resets_reset_token_hash' in query_plan(
+        PasswordReset.query.filter_by(reset_token_hash=PasswordReset.hash_reset_token('token'))
+    )
+
+def test_auth_purge_scans_expiry_index(client):
+    now = datetime.utcnow()
+    query = PendingLogin.query.filter(PendingLogin.otp_expires_at < now).limit(1000)
+    assert 'ix_pending_logins_otp_expires_at' in query_plan(query)
+
+def test_email_lookup_uses_normalized_email_index(client):
+    from models import User, normalize_email
+    plan = query_plan(User.query.filter_by(email_normalized=normalize_email('Someone@Example.com')))
+    assert 'ix_users_email_normalized' in plan
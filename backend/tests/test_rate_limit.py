@@ -0,0 +1,113 @@
+import pytest
+from app import app
+from db import db
+from models import User
+from utils.rate_limit import InMemoryRateLimiter
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Enable the limits with a fresh in-process limiter"""
+    limiter = InMemoryRateLimiter()
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(app.extensions, 'rate_limiter', limiter)
+    return limiter
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    import utils.rate_limit
+    now = [1000.0]
+    monkeypatch.setattr(utils.rate_limit.time, 'monotonic', lambda: now[0])
+    limiter = InMemoryRateLimiter()
+    
+    assert [limiter.hit('k', 3, 60) for _ in range(3)] == [0, 0, 0]
+    assert limiter.hit('k', 3, 60) == pytest.approx(20)
+    
+    # One token every 20 seconds
+    now[0] += 20
+    assert limiter.hit('k', 3, 60) == 0
+    assert limiter.hit('k', 3, 60) > 0
+
+def test_least_recently_used_buckets_are_evicted():
+    limiter = InMemoryRateLimiter(max_keys=2)
+    limiter.hit('a', 1, 60)
+    limiter.hit('b', 1, 60)
+    limiter.hit('c', 1, 60)
+    assert list(limiter._buckets) == ['b', 'c']
+
+def test_login_limited_per_username_without_touching_the_database(client, limiter):
+    from sqlalchemy import event
+    admin = User(username='admin', email='admin@test.com', role='admin')
+    admin.set_password('admin123')
+    db.session.add(admin)
+    db.session.commit()
+    
+    for _ in range(10):
+        response = client.post('/api/auth/login', json={'username': 'Admin', 'password': 'wrong'})
+        assert response.status_code == 401
+    
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        # Even the right password is refused once the username's bucket is empty
+        response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert statements == []
+    
+    # Other usernames from the same IP still get through
+    response = client.post('/api/auth/login', json={'username': 'someoneelse', 'password': 'x'})
+    assert response.status_code == 401
+
+def test_forgot_password_limited_per_email(client, limiter, monkeypatch):
+    import routes.auth
+    sent = []
+    monkeypatch.setattr(routes.auth, 'send_password_reset_otp', lambda email, otp, username: sent.append(otp) or True)
+    user = User(username='resetuser', email='reset@example.com', role='user')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    
+    statuses = [client.post('/api/auth/forgot-password', json={'email': email}).status_code
+                for email in ['reset@example.com', 'RESET@example.com', ' reset@example.com', 'reset@example.com']]
+    assert statuses == [200, 200, 200, 429]
+    assert len(sent) == 3
+
+def test_verify_login_otp_limited_per_pending_login(client, limiter):
+    statuses = [client.post('/api/auth/verify-login-otp', json={'pending_login_id': 'some-challenge', 'otp': '123456'}).status_code
+                for _ in range(11)]
+    assert statuses == [400] * 10 + [429]
+
+def test_limiter_failures_fail_open(client, monkeypatch):
+    import sys
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+    
+    # Redis configured but its client can't be imported or reached
+    monkeypatch.setitem(app.config, 'REDIS_URL', 'redis://localhost:1/0')
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    app.extensions.pop('rate_limiter', None)
+    response = client.post('/api/auth/login', json={'username': 'nobody', 'password': 'x'})
+    assert response.status_code == 401
+    
+    class BrokenLimiter:
+        def hit(self, key, capacity, period):
+            raise ConnectionError('Redis down')
+    monkeypatch.setitem(app.extensions, 'rate_limiter', BrokenLimiter())
+    response = client.post('/api/auth/login', json={'username': 'nobody', 'password': 'x'})
+    assert response.status_code == 401
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine
+from app import app
+from db import db
+from models import User, Loan
+from utils.auth_tokens import create_user_token
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def replica(client, tmp_path, monkeypatch):
+    """A second SQLite file standing in for a replica that hasn't caught up"""
+    engine = create_engine(f'sqlite:///{tmp_path}/replica.db')
+    db.metadata.create_all(engine)
+    monkeypatch.setitem(app.extensions, 'read_replicas', {'replica0': engine})
+    monkeypatch.setitem(app.extensions, 'ttl_stores', {})
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def borrower_headers(client):
+    user = User(username='borrower', email='borrower@example.com', role='user', profile_completed=True)
+    user.set_password('testpass123')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Loan(user_id=user.id, amount=1000, purpose='Existing loan', status=Loan.PENDING))
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_user_token(user)}'}
+
+def test_reads_go_to_the_replica(client, replica, borrower_headers):
+    # Auth checks still read the primary, where the user exists
+    response = client.get('/api/loans', headers=borrower_headers)
+    assert response.status_code == 200
+    # The loan only exists on the primary
+    assert response.get_json()['loans'] == []
+
+def test_writer_reads_own_writes_from_primary(client, replica, borrower_headers):
+    response = client.post('/api/loans', headers=borrower_headers, json={'amount': 500, 'purpose': 'New loan'})
+    assert response.status_code == 201
+    
+    loans = client.get('/api/loans', headers=borrower_headers).get_json()['loans']
+    assert [loan['purpose'] for loan in loans] == ['New loan', 'Existing loan']
+    
+    # Other users aren't held to the primary by someone else's write
+    other = User(username='other', email='other@example.com', role='user', profile_completed=True)
+    other.set_password('testpass123')
+    db.session.add(other)
+    db.session.commit()
+    response = client.get('/api/loans', headers={'Authorization': f'Bearer {create_user_token(other)}'})
+    assert response.get_json()['loans'] == []
+
+def test_stickiness_expires(client, replica, borrower_headers, monkeypatch):
+    monkeypatch.setitem(app.config, 'REPLICA_STICKY_SECONDS', 0)
+    client.post('/api/loans', headers=borrower_headers, json={'amount': 500, 'purpose': 'New loan'})
+    
+    assert client.get('/api/loans', headers=borrower_headers).get_json()['loans'] == []
+
+def test_handlers_without_replicas_read_the_primary(client, borrower_headers):
+    loans = client.get('/api/loans', headers=borrower_headers).get_json()['loans']
+    assert [loan['purpose'] for loan in loans] == ['Existing loan']
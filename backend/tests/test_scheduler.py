@@ -0,0 +1,228 @@
+import pytest
+import scheduler
+from app import app
+from db import db
+from models import User, Loan, SchedulerLease, JobRun, EmailOutbox, PendingRegistration, PendingLogin, PasswordReset
+from datetime import datetime, timedelta
+from utils import email_service
+from utils.job_lease import renew_job_lease
+from utils.query_counter import track_queries
+from utils.response_cache import PENDING_LOANS_CACHE, get_cache_version
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.drop_all()
+
+@pytest.fixture
+def borrower(client):
+    user = User(username='borrower', email='borrower@test.com', role='user')
+    user.set_password('test123')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+@pytest.fixture
+def sent_notifications(monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_service, 'send_loan_notification', lambda loan, action: sent.append((loan.id, action)))
+    return sent
+
+def add_loan(user_id, days_old, status=Loan.PENDING):
+    loan = Loan(
+        user_id=user_id,
+        amount=1000,
+        purpose='Test loan',
+        status=status,
+        created_at=datetime.utcnow() - timedelta(days=days_old)
+    )
+    db.session.add(loan)
+    return loan
+
+def test_bulk_auto_reject_in_chunks(client, borrower, sent_notifications):
+    stale = [add_loan(borrower, days_old=6 + i) for i in range(7)]
+    fresh = add_loan(borrower, days_old=1)
+    approved = add_loan(borrower, days_old=10, status=Loan.APPROVED)
+    db.session.commit()
+    stale_ids = {loan.id for loan in stale}
+    
+    rejected = scheduler.auto_reject_old_loans(app, chunk_size=3)
+    
+    assert rejected == 7
+    # The pending-queue cache was invalidated
+    assert get_cache_version(PENDING_LOANS_CACHE) is not None
+    db.session.expire_all()
+    for loan_id in stale_ids:
+        loan = Loan.query.get(loan_id)
+        assert loan.status == Loan.REJECTED
+        assert loan.rejection_reason == Loan.REASON_AUTO_REJECTED
+        assert loan.reviewed_at is not None
+    assert Loan.query.get(fresh.id).status == Loan.PENDING
+    assert Loan.query.get(approved.id).status == Loan.APPROVED
+    # Notifications are queued in the outbox, not sent inline
+    assert sent_notifications == []
+    queued = EmailOutbox.query.all()
+    assert len(queued) == 7
+    assert all(entry.recipient == 'borrower@test.com' for entry in queued)
+    assert all(entry.subject == 'Loan Application Rejected' for entry in queued)
+
+def test_bulk_auto_reject_nothing_to_do(client, borrower, sent_notifications):
+    add_loan(borrower, days_old=1)
+    db.session.commit()
+    
+    assert scheduler.auto_reject_old_loans(app) == 0
+    assert EmailOutbox.query.count() == 0
+    assert get_cache_version(PENDING_LOANS_CACHE) is None
+
+def test_row_by_row_auto_reject(client, borrower, sent_notifications):
+    stale = add_loan(borrower, days_old=6)
+    db.session.commit()
+    
+    assert scheduler.auto_reject_old_loans(app, bulk=False) == 1
+    db.session.expire_all()
+    assert Loan.query.get(stale.id).status == Loan.REJECTED
+    # Queued in the outbox like the bulk path, not sent inside the job
+    assert sent_notifications == []
+    assert [entry.recipient for entry in EmailOutbox.query.all()] == ['borrower@test.com']
+
+def test_only_one_holder_runs_job_per_interval(client, borrower, sent_notifications):
+    add_loan(borrower, days_old=6)
+    add_loan(borrower, days_old=7)
+    db.session.commit()
+    
+    first = scheduler.run_singleton_job(app, 'auto_reject_loans', scheduler.auto_reject_old_loans, 3600, holder='worker-1')
+    second = scheduler.run_singleton_job(app, 'auto_reject_loans', scheduler.auto_reject_old_loans, 3600, holder='worker-2')
+    
+    assert first is not None
+    assert second is None
+    db.session.expire_all()
+    runs = JobRun.query.all()
+    assert len(runs) == 1
+    assert runs[0].holder == 'worker-1'
+    assert runs[0].status == JobRun.SUCCEEDED
+    assert runs[0].rows_affected == 2
+    assert runs[0].finished_at >= runs[0].started_at
+    
+    # The holder itself renews on its next tick
+    assert scheduler.run_singleton_job(app, 'auto_reject_loans', scheduler.auto_reject_old_loans, 3600, holder='worker-1') is not None
+
+def test_lease_fails_over_when_expired(client):
+    assert scheduler.acquire_job_lease('auto_reject_loans', 3600, holder='worker-1')
+    assert not scheduler.acquire_job_lease('auto_reject_loans', 3600, holder='worker-2')
+    
+    # Simulate the holder dying: its lease runs out without renewal
+    lease = SchedulerLease.query.get('auto_reject_loans')
+    lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    
+    assert scheduler.acquire_job_lease('auto_reject_loans', 3600, holder='worker-2')
+    db.session.expire_all()
+    assert SchedulerLease.query.get('auto_reject_loans').holder == 'worker-2'
+
+def test_losing_worker_does_not_insert_a_lease(client):
+    assert scheduler.acquire_job_lease('auto_reject_loans', 3600, holder='worker-1')
+    
+    with track_queries() as stats:
+        assert not scheduler.acquire_job_lease('auto_reject_loans', 3600, holder='worker-2')
+    
+    # No INSERT bound to hit the primary key (a logged duplicate-key error on PostgreSQL)
+    assert not any(statement.lstrip().upper().startswith('INSERT') for statement in stats.statements)
+
+def test_long_job_renews_its_lease_and_stops_once_taken_over(client, borrower, monkeypatch):
+    for i in range(6):
+        add_loan(borrower, days_old=6 + i)
+    db.session.commit()
+    renewals = []
+    
+    def renew_then_lose_lease():
+        renewals.append(1)
+        if len(renewals) == 2:
+            # The run outlived its lease and another worker took the job over
+            lease = SchedulerLease.query.get('auto_reject_loans')
+            lease.holder = 'worker-2'
+            lease.expires_at = datetime.utcnow() + timedelta(hours=1)
+            db.session.commit()
+        return renew_job_lease()
+    monkeypatch.setattr(scheduler, 'renew_job_lease', renew_then_lose_lease)
+    
+    run_id = scheduler.run_singleton_job(app, 'auto_reject_loans', scheduler.auto_reject_old_loans, 3600, True, 2, holder='worker-1')
+    
+    # The first renewal kept the lease; once it was lost the job stopped
+    assert JobRun.query.get(run_id).rows_affected == 4
+    assert Loan.query.filter_by(status=Loan.PENDING).count() == 2
+
+def test_renew_job_lease_outside_a_job(client):
+    assert renew_job_lease() is True
+
+def test_failed_job_run_is_recorded(client):
+    def broken_job(app):
+        raise RuntimeError('boom')
+    
+    run_id = scheduler.run_singleton_job(app, 'broken_job', broken_job, 60, holder='worker-1')
+    
+    job_run = JobRun.query.get(run_id)
+    assert job_run.status == JobRun.FAILED
+    assert job_run.error == 'boom'
+    assert job_run.finished_at is not None
+
+def test_purge_expired_auth_rows_in_chunks(client, borrower):
+    now = datetime.utcnow()
+    for i in range(5):
+        db.session.add(PendingRegistration(username=f'stale{i}', email=f'stale{i}@test.com', password_hash='x',
+                                           otp='123456', otp_expires_at=now - timedelta(minutes=1 + i)))
+    db.session.add(PendingRegistration(username='fresh', email='fresh@test.com', password_hash='x',
+                                       otp='123456', otp_expires_at=now + timedelta(minutes=5)))
+    db.session.add(PendingLogin(user_id=borrower, email='borrower@test.com', otp='123456',
+                                otp_expires_at=now - timedelta(hours=1)))
+    # OTP expired but the reset token issued from it is still usable
+    live_reset = PasswordReset(user_id=borrower, email='borrower@test.com', otp='123456',
+                               otp_expires_at=now - timedelta(minutes=5),
+                               reset_token_expires_at=now + timedelta(minutes=10))
+    db.session.add(live_reset)
+    db.session.add(PasswordReset(user_id=borrower, email='borrower@test.com', otp='654321',
+                                 otp_expires_at=now - timedelta(hours=1),
+                                 reset_token_expires_at=now - timedelta(minutes=30)))
+    db.session.commit()
+    
+    assert scheduler.purge_expired_auth_rows(app, chunk_size=2) == 7
+    
+    assert [row.username for row in PendingRegistration.query.all()] == ['fresh']
+    assert PendingLogin.query.count() == 0
+    assert [row.id for row in PasswordReset.query.all()] == [live_reset.id]
+
+def test_start_scheduler_respects_config_and_is_idempotent(monkeypatch):
+    from apscheduler.schedulers.background import BackgroundScheduler
+    background = BackgroundScheduler()
+    
+    monkeypatch.setitem(app.config, 'SCHEDULER_ENABLED', False)
+    assert scheduler.start_scheduler(app, background) is False
+    assert not background.running
+    
+    monkeypatch.setitem(app.config, 'SCHEDULER_ENABLED', True)
+    try:
+        assert scheduler.start_scheduler(app, background) is True
+        # A second call (e.g. the hook re-running) doesn't raise SchedulerAlreadyRunningError
+        assert scheduler.start_scheduler(app, background) is True
+        assert background.running
+    finally:
+        background.shutdown(wait=False)
+
+def test_run_scheduler_command_runs_every_job_in_the_foreground(monkeypatch):
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    started = []
+    monkeypatch.setattr(BlockingScheduler, 'start', lambda self, *args, **kwargs: started.append(self))
+    # Independent of the web workers' setting
+    monkeypatch.setitem(app.config, 'SCHEDULER_ENABLED', False)
+    
+    result = app.test_cli_runner().invoke(args=['run-scheduler'])
+    
+    assert result.exit_code == 0, result.output
+    assert len(started) == 1
+    assert {job.id for job in started[0].get_jobs()} == {'auto_reject_loans', 'dispatch_email_outbox', 'purge_expired_auth_rows'}
@@ -0,0 +1,41 @@
+import sys
+import pytest
+from app import app
+from utils.ttl_store import InMemoryTTLStore, check_redis_client
+
+def test_redis_url_without_redis_package_fails_clearly(monkeypatch):
+    check_redis_client('')
+    
+    # A None entry makes "import redis" raise ImportError
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    check_redis_client('')
+    with pytest.raises(RuntimeError, match="REDIS_URL is set but the 'redis' package is not installed"):
+        check_redis_client('redis://localhost:6379/0')
+
+def test_counter_expires_with_its_ttl(monkeypatch):
+    import utils.ttl_store
+    now = [1000.0]
+    monkeypatch.setattr(utils.ttl_store.time, 'monotonic', lambda: now[0])
+    store = InMemoryTTLStore()
+    
+    assert [store.incr('nonce', 60) for _ in range(3)] == [1, 2, 3]
+    now[0] += 61
+    assert store.incr('nonce', 60) == 1
+
+def test_redis_clients_time_out_quickly(monkeypatch):
+    from utils.rate_limit import RedisRateLimiter
+    from utils.response_cache import RedisCache
+    from utils.ttl_store import RedisTTLStore
+    monkeypatch.setitem(app.config, 'REDIS_SOCKET_TIMEOUT', 0.2)
+    
+    with app.app_context():
+        clients = [
+            RedisRateLimiter('redis://localhost:6379/0').client,
+            RedisCache('redis://localhost:6379/0', 'cache').client,
+            RedisTTLStore('redis://localhost:6379/0', 'store').client
+        ]
+    
+    # An unreachable Redis fails fast (and rate limits fail open) instead of hanging requests
+    for client in clients:
+        assert client.connection_pool.connection_kwargs['socket_timeout'] == 0.2
+        assert client.connection_pool.connection_kwargs['socket_connect_timeout'] == 0.2
@@ -0,0 +1,110 @@
+import threading
+import time
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required
+from db import db
+from models import User
+
+# How long a worker trusts its cached copy of a user's token_version.
+# Bounds how long a revoked token keeps working on other workers.
+TOKEN_VERSION_CACHE_TTL = 60
+
+_token_versions = {}  # user_id -> (token_version, fetched_at)
+_token_versions_lock = threading.Lock()
+
+def create_user_token(user):
+    """Issue an access token carrying the claims needed for authorization"""
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims={
+            'role': user.role,
+            'profile_completed': user.profile_completed,
+            'tv': user.token_version or 0
+        }
+    )
+
+def get_token_version(user_id):
+    """Current token_version for user_id, from a short-lived per-process cache"""
+    now = time.monotonic()
+    with _token_versions_lock:
+        cached = _token_versions.get(user_id)
+    if cached and now - cached[1] < TOKEN_VERSION_CACHE_TTL:
+        return cached[0]
+
+    version = db.session.query(User.token_version).filter_by(id=user_id).scalar()
+    with _token_versions_lock:
+        _token_versions[user_id] = (version, now)
+    return version
+
+def invalidate_user_tokens(user):
+    """Revoke every token issued to user so far (caller commits)
+
+    Use when the role or anything else carried in the claims changes.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    with _token_versions_lock:
+        _token_versions[user.id] = (user.token_version, time.monotonic())
+
+def clear_token_version_cache():
+    with _token_versions_lock:
+        _token_versions.clear()
+
+class TokenIdentity:
+    """The authenticated user as described by the JWT claims"""
+
+    def __init__(self, user_id, role, profile_completed):
+        self.id = user_id
+        self.role = role
+        self._profile_completed = profile_completed
+
+    @property
+    def profile_completed(self):
+        # A profile is never un-completed, so only a False claim can be stale
+        # (the token was issued before the profile was saved)
+        if not self._profile_completed:
+            user = User.query.get(self.id)
+            self._profile_completed = bool(user and user.profile_completed)
+        return self._profile_completed
+
+def get_token_identity():
+    """Resolve the current request's identity from its JWT, without a query when possible
+
+    Returns None if the token has been revoked or the user no longer exists.
+    Tokens issued before claims were added fall back to a User lookup.
+    """
+    claims = get_jwt()
+    # g can outlive one request (e.g. a test holding an app context), so the
+    # cached identity is tied to the decoded token it came from
+    cached = g.get('token_identity')
+    if cached and cached[0] is claims:
+        return cached[1]
+
+    user_id = int(get_jwt_identity())
+
+    if 'role' in claims and 'tv' in claims:
+        if get_token_version(user_id) != claims['tv']:
+            identity = None
+        else:
+            identity = TokenIdentity(user_id, claims['role'], claims.get('profile_completed', False))
+    else:
+        user = User.query.get(user_id)
+        identity = TokenIdentity(user.id, user.role, user.profile_completed) if user else None
+
+    g.token_identity = (claims, identity)
+    return identity
+
+def require_role(*roles):
+    """Decorator: require a valid JWT whose role claim is one of roles (any role if none given)"""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            identity = get_token_identity()
+            if not identity:
+                return jsonify({'error': 'Token is no longer valid'}), 401
+            if roles and identity.role not in roles:
+                return jsonify({'error': f'{roles[0].capitalize()} access required'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
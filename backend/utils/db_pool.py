@@ -0,0 +1,135 @@
+import os
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from utils.metrics import DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+# Connection pool settings per deployment, picked with DB_POOL_PROFILE and
+# overridable one by one (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+# DB_POOL_RECYCLE, DB_POOL_PRE_PING). Sizes are per gunicorn worker, so the
+# database must allow workers * (pool_size + max_overflow) connections.
+POOL_PROFILES = {
+    # Managed databases with low connection limits (e.g. Railway's smaller
+    # plans); their proxies drop connections idle for about 5 minutes
+    'small': {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 10, 'pool_recycle': 280},
+    # One connection per gunicorn thread, plus headroom for the scheduler
+    # and email outbox threads
+    'default': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10, 'pool_recycle': 1800},
+    # Dedicated database servers with connections to spare
+    'large': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 1800}
+}
+
+_ENV_OVERRIDES = {
+    'pool_size': 'DB_POOL_SIZE',
+    'max_overflow': 'DB_MAX_OVERFLOW',
+    'pool_timeout': 'DB_POOL_TIMEOUT',
+    'pool_recycle': 'DB_POOL_RECYCLE'
+}
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait, timeouts and usage to Prometheus
+
+    metrics_name labels the samples; init_db_pool() sets it to the bind key.
+    """
+
+    metrics_name = 'default'
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.metrics_name).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_name).observe(time.perf_counter() - started)
+        self._report_usage()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._report_usage()
+
+    def _report_usage(self):
+        DB_POOL_CHECKED_OUT.labels(self.metrics_name).set(self.checkedout())
+        # overflow() counts up from -pool_size; only connections beyond the pool matter here
+        DB_POOL_OVERFLOW.labels(self.metrics_name).set(max(self.overflow(), 0))
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool; keep its label
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+    def stats(self):
+        """Current usage, as also exported to Prometheus"""
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'checked_in': self.checkedin(),
+            'overflow': max(self.overflow(), 0),
+            'max_overflow': self._max_overflow
+        }
+
+def engine_options(database_url, environ=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for database_url from DB_POOL_* settings
+
+    SQLite keeps SQLAlchemy's defaults: there is no server connection to
+    pool, and an in-memory database must stay on its single connection.
+    """
+    if database_url.startswith('sqlite'):
+        return {}
+    environ = os.environ if environ is None else environ
+
+    profile_name = environ.get('DB_POOL_PROFILE', 'default')
+    if profile_name not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE '{profile_name}'; expected one of {', '.join(POOL_PROFILES)}")
+
+    options = dict(POOL_PROFILES[profile_name])
+    for option, variable in _ENV_OVERRIDES.items():
+        if environ.get(variable):
+            options[option] = int(environ[variable])
+    options['pool_pre_ping'] = environ.get('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    # Reuse the most recent connection so surplus ones sit idle until recycled
+    options['pool_use_lifo'] = True
+    options['poolclass'] = InstrumentedQueuePool
+    return options
+
+def init_db_pool(app, db):
+    """Label each engine's pool metrics with its bind key"""
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if isinstance(engine.pool, InstrumentedQueuePool):
+                engine.pool.metrics_name = bind_key or 'default'
+
+def warm_pool(engine, connections):
+    """Open up to connections pooled connections now instead of on first use"""
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    opened = []
+    try:
+        # Hold them all at once, otherwise the pool hands back the same one
+        for _ in range(min(connections, engine.pool.size())):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+def warm_pools(app, db):
+    """Warm every engine's pool; run once per worker process (see gunicorn.conf.py)"""
+    connections = app.config.get('DB_POOL_WARM', 0)
+    if not connections:
+        return
+    with app.app_context():
+        engines = dict(db.engines)
+        engines.update(app.extensions.get('read_replicas', {}))
+        for bind_key, engine in engines.items():
+            try:
+                opened = warm_pool(engine, connections)
+            except Exception as e:
+                # The worker still serves; connections just open on first use
+                print(f"Could not warm database pool {bind_key or 'default'}: {e}")
+            else:
+                if opened:
+                    print(f"Warmed database pool {bind_key or 'default'} with {opened} connections")
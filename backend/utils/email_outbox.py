@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from db import db
+from models import EmailOutbox
+from utils.email_service import build_loan_notification, send_many
+from utils.job_lease import renew_job_lease
+
+# Number of outbox rows sent per dispatcher pass
+DISPATCH_BATCH_SIZE = 100
+# First retry waits this long, doubling on every further failure
+RETRY_BASE_DELAY = timedelta(seconds=30)
+# A claimed batch not finished within this long is assumed lost with its
+# dispatcher (worker killed mid-send) and becomes due again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+def queue_email(recipient, subject, body):
+    """Add an email to the outbox in the current transaction (caller commits)"""
+    entry = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        status=EmailOutbox.PENDING,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(entry)
+    return entry
+
+def queue_loan_notification(loan, action):
+    """Queue the loan approval/rejection email for the loan's owner"""
+    subject, body = build_loan_notification(loan, action)
+    return queue_email(loan.user.email, subject, body)
+
+def _due_filter(now):
+    return or_(
+        and_(EmailOutbox.status == EmailOutbox.PENDING, EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == EmailOutbox.SENDING, EmailOutbox.claimed_at <= now - CLAIM_TIMEOUT)
+    )
+
+def claim_due_emails(batch_size=DISPATCH_BATCH_SIZE):
+    """Mark up to batch_size due emails as SENDING for this caller and return them
+
+    The claim is a status-guarded UPDATE committed before anything is sent,
+    so a row claimed here is skipped by every other dispatcher until it is
+    settled or its claim times out.
+    """
+    now = datetime.utcnow()
+    ids = [row.id for row in db.session.query(EmailOutbox.id).filter(
+        _due_filter(now)
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size)]
+    if not ids:
+        db.session.rollback()
+        return []
+    
+    claim_token = uuid.uuid4().hex
+    # Re-checked per row, so of two dispatchers racing for a row only one claims it
+    EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ids),
+        _due_filter(now)
+    ).update({
+        EmailOutbox.status: EmailOutbox.SENDING,
+        EmailOutbox.claimed_at: now,
+        EmailOutbox.claim_token: claim_token
+    }, synchronize_session=False)
+    db.session.commit()
+    
+    return EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.claim_token == claim_token
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).all()
+
+def dispatch_email_outbox(app, batch_size=DISPATCH_BATCH_SIZE):
+    """Send due outbox emails in batches, rescheduling failures with exponential backoff
+
+    Each batch is claimed before it is sent and goes out over one pooled
+    SMTP session. Rows are only marked sent after the server accepted them,
+    so a crash mid-batch means a retry once the claim times out
+    (at-least-once delivery), never a lost notification.
+    Returns the number of emails sent.
+    """
+    with app.app_context():
+        sent_count = 0
+        
+        while True:
+            entries = claim_due_emails(batch_size)
+            
+            if not entries:
+                break
+            
+            results = send_many([(entry.recipient, entry.subject, entry.body) for entry in entries])
+            
+            for entry, error in zip(entries, results or [None] * len(entries)):
+                entry.attempts += 1
+                entry.claim_token = None
+                if results is None:
+                    entry.status = EmailOutbox.SKIPPED
+                elif error is None:
+                    entry.status = EmailOutbox.SENT
+                    entry.sent_at = datetime.utcnow()
+                    sent_count += 1
+                else:
+                    entry.last_error = str(error)
+                    if entry.attempts >= entry.max_attempts:
+                        entry.status = EmailOutbox.FAILED
+                        print(f"Giving up on outbox email {entry.id} after {entry.attempts} attempts: {error}")
+                    else:
+                        entry.status = EmailOutbox.PENDING
+                        entry.next_attempt_at = datetime.utcnow() + RETRY_BASE_DELAY * (2 ** (entry.attempts - 1))
+            
+            db.session.commit()
+            db.session.expunge_all()
+            
+            # A long backlog can outlast the lease; stop if another worker took over
+            if not renew_job_lease():
+                break
+        
+        return sent_count
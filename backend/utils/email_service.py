@@ -1,18 +1,9 @@
 from flask_mail import Message
 from flask import current_app
+from utils.mail_transport import get_mail_pool
 
-def send_loan_notification(loan, action):
-    """Send email notification for loan approval/rejection"""
-    if not current_app.config.get('MAIL_USERNAME'):
-        print("Email not configured. Skipping email notification.")
-        return
-    
-    # Get mail instance from current_app
-    mail = current_app.extensions.get('mail')
-    if not mail:
-        print("Mail extension not found. Skipping email notification.")
-        return
-    
+def build_loan_notification(loan, action):
+    """Build the subject and body of the loan approval/rejection email"""
     user = loan.user
     subject = f"Loan Application {action.capitalize()}"
     
@@ -76,21 +67,70 @@ Best regards,
 Loan Management System
 """
     
+    return subject, body
+
+def send_email(recipient, subject, body):
+    """Send a plain-text email from the LMS sender address
+
+    Returns False if email is not configured, raises if sending fails.
+    """
+    if not current_app.config.get('MAIL_USERNAME'):
+        print("Email not configured. Skipping email.")
+        return False
+    
+    # Get mail instance from current_app
+    mail = current_app.extensions.get('mail')
+    if not mail:
+        print("Mail extension not found. Skipping email.")
+        return False
+    
+    get_mail_pool().send(_build_message(recipient, subject, body))
+    print(f"Email sent to {recipient}")
+    return True
+
+def send_many(emails):
+    """Send (recipient, subject, body) emails over a single pooled SMTP session
+
+    Returns None if email is not configured, otherwise one entry per email:
+    None if it was sent or the exception it failed with.
+    """
+    if not current_app.config.get('MAIL_USERNAME'):
+        print("Email not configured. Skipping emails.")
+        return None
+    
+    if not current_app.extensions.get('mail'):
+        print("Mail extension not found. Skipping emails.")
+        return None
+    
+    messages = [_build_message(recipient, subject, body) for recipient, subject, body in emails]
+    results = get_mail_pool().send_many(messages)
+    print(f"Sent {results.count(None)} of {len(messages)} email(s) in one SMTP session")
+    return results
+
+def _build_message(recipient, subject, body):
+    # Get sender email from config
+    sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@loanmanagement.com')
+    
+    # Use LMS as display name with the sender email
+    return Message(
+        subject=subject,
+        recipients=[recipient],
+        body=body,
+        sender=('LMS', sender_email),
+        reply_to=sender_email
+    )
+
+def send_loan_notification(loan, action):
+    """Send email notification for loan approval/rejection"""
+    if not current_app.config.get('MAIL_USERNAME'):
+        print("Email not configured. Skipping email notification.")
+        return
+    
+    subject, body = build_loan_notification(loan, action)
+    
     try:
-        # Get sender email from config
-        sender_email = current_app.config.get('MAIL_USERNAME', 'noreply@loanmanagement.com')
-        print(f"DEBUG: Sending loan notification from: {sender_email} to: {user.email}")
-        
-        # Use LMS as display name with the sender email
-        msg = Message(
-            subject=subject,
-            recipients=[user.email],
-            body=body,
-            sender=('LMS', sender_email),
-            reply_to=sender_email
-        )
-        mail.send(msg)
-        print(f"Email notification sent to {user.email} from {sender_email}")
+        print(f"DEBUG: Sending loan notification to: {loan.user.email}")
+        send_email(loan.user.email, subject, body)
     except Exception as e:
         print(f"Failed to send email: {e}")
         raise
@@ -170,7 +210,7 @@ Loan Management System
         print(f"DEBUG: Message sender set to: {msg.sender}")
         print(f"DEBUG: Message reply_to set to: {msg.reply_to}")
         
-        mail.send(msg)
+        get_mail_pool().send(msg)
         print(f"SUCCESS: OTP email sent to {email} from {sender_email}")
         return True
     except Exception as e:
@@ -239,7 +279,7 @@ Loan Management System
         
         print(f"DEBUG: Message sender set to: {msg.sender}")
         
-        mail.send(msg)
+        get_mail_pool().send(msg)
         print(f"SUCCESS: Password reset OTP email sent to {email} from {sender_email}")
         return True
     except Exception as e:
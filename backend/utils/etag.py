@@ -0,0 +1,32 @@
+import hashlib
+from flask import current_app, make_response, request
+
+def make_etag(*version):
+    """Weak ETag value for a response described by version (any repr-able values)
+
+    The request's query string is folded in so different pages and filters of
+    the same resource never share a tag.
+    """
+    digest = hashlib.sha1(repr((version, request.query_string)).encode()).hexdigest()
+    return digest[:32]
+
+def conditional_response(version, build_response):
+    """Answer If-None-Match with 304, otherwise call build_response() for the full body
+
+    version should come from a cheap query (e.g. max(updated_at) and count(*))
+    that changes whenever the body would; build_response returns anything a
+    view may return and is skipped entirely on a match.
+    """
+    etag = make_etag(*version)
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build_response())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag, weak=True)
+    # Let the browser keep the body but revalidate it on every poll
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,86 @@
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from db import db
+from models import SchedulerLease
+
+# Lease held by the job running on this thread (see holding_job_lease)
+_running = threading.local()
+
+def get_lease_holder():
+    """Identify this process across hosts (evaluated per call so forked workers differ)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def acquire_job_lease(job_id, lease_seconds, holder=None):
+    """Try to take or renew the lease for job_id; returns True if this process holds it
+
+    The lease lasts a full job interval, so once a process has run the job
+    every other worker skips it until the holder renews on its next tick.
+    If the holder dies the lease expires and the next worker to fire takes over.
+    """
+    holder = holder or get_lease_holder()
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+
+    # Atomic takeover: only succeeds if the lease is ours or has expired
+    updated = SchedulerLease.query.filter(
+        SchedulerLease.job_id == job_id,
+        or_(SchedulerLease.holder == holder, SchedulerLease.expires_at <= now)
+    ).update({
+        SchedulerLease.holder: holder,
+        SchedulerLease.acquired_at: now,
+        SchedulerLease.expires_at: expires_at
+    }, synchronize_session=False)
+    db.session.commit()
+
+    if updated:
+        return True
+
+    # Usually someone else holds the lease. Look before inserting so losing
+    # workers don't log a duplicate-key error on every tick.
+    if db.session.query(SchedulerLease.job_id).filter_by(job_id=job_id).first() is not None:
+        db.session.rollback()
+        return False
+
+    # The job has never run; only its very first tick can race here
+    try:
+        db.session.add(SchedulerLease(job_id=job_id, holder=holder, acquired_at=now, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+@contextmanager
+def holding_job_lease(job_id, lease_seconds, holder):
+    """Make the lease renewable from the job body with renew_job_lease()"""
+    _running.lease = (job_id, lease_seconds, holder)
+    try:
+        yield
+    finally:
+        _running.lease = None
+
+def renew_job_lease():
+    """Extend the running job's lease for another interval
+
+    Jobs call this between units of work (the caller has committed) and stop
+    when it returns False: another process has taken the lease over and may
+    be running the job too. Outside a leased job it always returns True.
+    """
+    lease = getattr(_running, 'lease', None)
+    if lease is None:
+        return True
+    job_id, lease_seconds, holder = lease
+    try:
+        renewed = acquire_job_lease(job_id, lease_seconds, holder=holder)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error renewing lease for job {job_id}: {e}")
+        return False
+    if not renewed:
+        print(f"Lost the lease for job {job_id}; stopping")
+    return renewed
@@ -0,0 +1,64 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; the stdlib encoder is used instead
+    orjson = None
+
+def _default(o):
+    """Encode the types both backends support beyond plain JSON
+
+    Datetimes and dates use ISO 8601 (what to_dict() already produces), not
+    the HTTP date format of Flask's default provider. Decimals become strings
+    so no precision is lost.
+    """
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider, with ISO 8601 datetimes"""
+    default = staticmethod(_default)
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """Serializes with orjson; output matches StdlibJSONProvider apart from whitespace"""
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for json.dumps options (indent, separators, ...) get the stdlib
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self._options(pretty)) + b'\n',
+            mimetype=self.mimetype
+        )
+
+# Provider installed on the app: orjson when available
+JSONProvider = OrjsonJSONProvider if orjson is not None else StdlibJSONProvider
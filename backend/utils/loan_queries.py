@@ -0,0 +1,64 @@
+from sqlalchemy import select
+from models import User, Loan
+
+# Read path for the list endpoints and exports: a Core SELECT of exactly the
+# columns Loan.to_dict() needs, turned straight into response dicts. No ORM
+# instances, identity map entries or relationship state are created per row.
+# The dicts must stay identical to Loan.to_dict() / User.to_dict().
+
+LOAN_COLUMNS = (
+    Loan.id,
+    Loan.user_id,
+    Loan.amount,
+    Loan.purpose,
+    Loan.status,
+    Loan.rejection_reason,
+    Loan.admin_notes,
+    Loan.created_at,
+    Loan.updated_at,
+    Loan.reviewed_at,
+    Loan.reviewed_by
+)
+USER_COLUMNS = (
+    User.id.label('user_id_'),
+    User.username.label('user_username'),
+    User.email.label('user_email'),
+    User.role.label('user_role'),
+    User.profile_completed.label('user_profile_completed'),
+    User.created_at.label('user_created_at')
+)
+
+def select_loans(include_user=False):
+    """SELECT of the loan columns, plus the owning user's if include_user"""
+    if include_user:
+        return select(*LOAN_COLUMNS, *USER_COLUMNS).outerjoin(User, User.id == Loan.user_id)
+    return select(*LOAN_COLUMNS)
+
+def loan_row_to_dict(row, include_user=False):
+    """Same dict as Loan.to_dict(include_user) for a row from select_loans(include_user)"""
+    (loan_id, user_id, amount, purpose, status, rejection_reason, admin_notes,
+     created_at, updated_at, reviewed_at, reviewed_by) = row[:11]
+    data = {
+        'id': loan_id,
+        'user_id': user_id,
+        'amount': float(amount),
+        'purpose': purpose,
+        'status': status,
+        'rejection_reason': rejection_reason,
+        'admin_notes': admin_notes,
+        'created_at': created_at.isoformat() if created_at else None,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+        'reviewed_at': reviewed_at.isoformat() if reviewed_at else None,
+        'reviewed_by': reviewed_by
+    }
+    if include_user:
+        (owner_id, username, email, role, profile_completed, owner_created_at) = row[11:17]
+        data['user'] = {
+            'id': owner_id,
+            'username': username,
+            'email': email,
+            'role': role,
+            'profile_completed': profile_completed,
+            'created_at': owner_created_at.isoformat() if owner_created_at else None
+        } if owner_id is not None else None
+    return data
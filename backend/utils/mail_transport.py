@@ -0,0 +1,139 @@
+import os
+import smtplib
+import threading
+import time
+from flask import current_app
+from flask_mail import Connection
+from utils.metrics import EMAIL_SEND_DURATION
+
+# Idle authenticated SMTP sessions kept open per process
+DEFAULT_POOL_SIZE = 2
+# Sessions idle longer than this get a NOOP before reuse (servers drop idle clients)
+DEFAULT_MAX_IDLE = 30
+
+class MailConnectionPool:
+    """Pool of authenticated Flask-Mail connections reused across messages
+
+    Flask-Mail's mail.send() opens a new SMTP session (TCP, STARTTLS, AUTH)
+    for every message. The pool keeps sessions open after use so later
+    sends skip the handshake, and send_many() pushes a batch through one
+    session.
+    """
+
+    def __init__(self, mail, pool_size=DEFAULT_POOL_SIZE, max_idle=DEFAULT_MAX_IDLE):
+        self.mail = mail
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self._idle = []  # (connection, last_used) pairs
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self):
+        connection = Connection(self.mail)
+        connection.__enter__()
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def _is_alive(self, connection):
+        try:
+            return connection.host.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Take an idle session from the pool or open a new one"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Sockets inherited from the parent of a forked worker can't be shared
+                self._idle = []
+                self._pid = os.getpid()
+
+            while self._idle:
+                connection, last_used = self._idle.pop()
+                if connection.host is None:
+                    return connection
+                if time.monotonic() - last_used < self.max_idle or self._is_alive(connection):
+                    return connection
+                self._close(connection)
+
+        return self._open()
+
+    def release(self, connection):
+        """Return a healthy session to the pool (closed if the pool is full)"""
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.pool_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+
+    def send(self, message):
+        """Send one message over a pooled session"""
+        error = self.send_many([message])[0]
+        if error:
+            raise error
+
+    def send_many(self, messages):
+        """Send messages over a single session
+
+        Returns one entry per message: None if it was sent, otherwise the
+        exception it failed with. A dropped session is reopened once and the
+        message retried, so one stale connection doesn't fail the batch.
+        """
+        results = []
+        try:
+            connection = self.acquire()
+        except Exception as e:
+            return [e] * len(messages)
+
+        try:
+            for message in messages:
+                started = time.perf_counter()
+                try:
+                    connection.send(message)
+                    results.append(None)
+                except smtplib.SMTPServerDisconnected:
+                    self._close(connection)
+                    connection = None
+                    try:
+                        connection = self._open()
+                        connection.send(message)
+                        results.append(None)
+                    except Exception as e:
+                        results.append(e)
+                        if connection is None:
+                            # Can't reach the server, fail the rest of the batch fast
+                            results.extend([e] * (len(messages) - len(results)))
+                            EMAIL_SEND_DURATION.labels('failed').observe(time.perf_counter() - started)
+                            break
+                except Exception as e:
+                    results.append(e)
+                EMAIL_SEND_DURATION.labels('sent' if results[-1] is None else 'failed').observe(time.perf_counter() - started)
+        finally:
+            if connection is not None:
+                self.release(connection)
+
+        return results
+
+    def close_all(self):
+        """Close every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+def get_mail_pool():
+    """Return the current app's connection pool, creating it on first use"""
+    pool = current_app.extensions.get('mail_pool')
+    if pool is None:
+        pool = MailConnectionPool(
+            current_app.extensions['mail'],
+            pool_size=current_app.config.get('MAIL_POOL_SIZE', DEFAULT_POOL_SIZE),
+            max_idle=current_app.config.get('MAIL_POOL_MAX_IDLE', DEFAULT_MAX_IDLE)
+        )
+        current_app.extensions['mail_pool'] = pool
+    return pool
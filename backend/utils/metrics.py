@@ -0,0 +1,145 @@
+import hmac
+import ipaddress
+import os
+import time
+from flask import Response, g, jsonify, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess
+)
+from utils.query_counter import current_query_stats
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes its
+# samples to files in that directory and /metrics sums them, so whichever worker
+# answers the scrape reports totals for all of them.
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency',
+    ['blueprint', 'endpoint', 'method']
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'HTTP requests by status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL statements executed per HTTP request',
+    ['blueprint', 'endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500, float('inf'))
+)
+EMAIL_SEND_DURATION = Histogram(
+    'email_send_duration_seconds',
+    'Time to hand one email to the SMTP server',
+    ['outcome']
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Time to hash or verify a password, including the wait for a hashing thread',
+    ['operation']
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'password_hash_queue_depth',
+    'Password hash operations running or waiting for a hashing thread',
+    multiprocess_mode='livesum'
+)
+PASSWORD_HASH_REJECTED = Counter(
+    'password_hash_rejected_total',
+    'Password hash operations refused because the hashing queue was full'
+)
+
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time to get a connection from the pool, including opening or pinging it',
+    ['pool'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out_connections',
+    'Pooled database connections currently in use',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow_connections',
+    'Database connections open beyond pool_size',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Requests for a connection that gave up after pool_timeout',
+    ['pool']
+)
+
+RATE_LIMITED = Counter(
+    'rate_limited_requests_total',
+    'Requests refused by a rate limit',
+    ['scope', 'key']
+)
+
+# Who may scrape /metrics without METRICS_TOKEN when METRICS_ALLOWED_IPS is unset
+DEFAULT_METRICS_ALLOWED_IPS = '127.0.0.0/8,::1'
+
+def _endpoint_labels():
+    # Unmatched URLs share one label so scanners can't blow up cardinality
+    return request.blueprint or '', request.endpoint or 'unmatched'
+
+def parse_allowed_networks(value):
+    """Comma-separated addresses or CIDR ranges, e.g. '10.0.0.0/8,::1'"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(',') if item.strip()]
+
+def _scraper_allowed(allowed_networks, token):
+    if token:
+        provided = request.headers.get('Authorization', '')
+        if hmac.compare_digest(provided.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in allowed_networks)
+
+def init_metrics(app):
+    """Time every request and expose the metrics at /metrics
+
+    Statements per request come from utils.query_counter; call
+    init_query_counter(app) as well. Scrapes need METRICS_TOKEN as a bearer
+    token or a client address in METRICS_ALLOWED_IPS (loopback by default).
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if '_metrics_start' not in g or request.endpoint == 'metrics':
+            return response
+        blueprint, endpoint = _endpoint_labels()
+        REQUEST_DURATION.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - g._metrics_start)
+        REQUEST_COUNT.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        stats = current_query_stats()
+        if stats is not None:
+            REQUEST_DB_QUERIES.labels(blueprint, endpoint).observe(stats.count)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        token = app.config.get('METRICS_TOKEN')
+        allowed_networks = parse_allowed_networks(app.config.get('METRICS_ALLOWED_IPS', DEFAULT_METRICS_ALLOWED_IPS))
+        if not _scraper_allowed(allowed_networks, token):
+            if token:
+                return jsonify({'error': 'Invalid or missing metrics token'}), 401
+            return jsonify({'error': 'Forbidden'}), 403
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+def render_metrics():
+    """Render all metrics in Prometheus text format, aggregated across workers if multiprocess"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import secrets
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from utils.ttl_store import get_ttl_store
+
+# Same lifetime as the database-backed PendingLogin OTP
+CHALLENGE_MAX_AGE = 10 * 60
+# Wrong OTPs allowed per login challenge (or pending login) before it is
+# invalidated, so the 6-digit code can't be guessed within its lifetime
+MAX_OTP_ATTEMPTS = 5
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='login-otp-challenge')
+
+def _otp_digest(nonce, otp):
+    key = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(key, f"{nonce}:{otp}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def is_challenge_token(value):
+    """Tell signed challenges apart from numeric PendingLogin ids"""
+    return isinstance(value, str) and not value.isdigit()
+
+def issue_login_challenge(user_id):
+    """Create an OTP and a signed, expiring challenge bound to it
+
+    The challenge carries the user id, a nonce and an HMAC of the OTP (never
+    the OTP itself), so verifying it needs no database state.
+    Returns (otp, challenge).
+    """
+    otp = ''.join(secrets.choice('0123456789') for _ in range(6))
+    nonce = secrets.token_urlsafe(16)
+    challenge = _serializer().dumps({'u': user_id, 'n': nonce, 'h': _otp_digest(nonce, otp)})
+    return otp, challenge
+
+def _load(challenge):
+    try:
+        return _serializer().loads(challenge, max_age=CHALLENGE_MAX_AGE)
+    except (BadSignature, SignatureExpired):
+        return None
+
+def _consume(nonce):
+    """Mark a nonce used; False if it was used before (replay)"""
+    return get_ttl_store('login-otp-nonces').add(nonce, CHALLENGE_MAX_AGE)
+
+def record_failed_otp(key):
+    """Count a wrong OTP for key; True once MAX_OTP_ATTEMPTS are used up"""
+    return get_ttl_store('login-otp-attempts').incr(key, CHALLENGE_MAX_AGE) >= MAX_OTP_ATTEMPTS
+
+def verify_login_challenge(challenge, provided_otp):
+    """Return the user id if the OTP matches an unexpired, unused challenge, else None
+
+    After MAX_OTP_ATTEMPTS wrong OTPs the challenge is used up, even for the right OTP.
+    """
+    data = _load(challenge)
+    if not data or not provided_otp:
+        return None
+    
+    if not hmac.compare_digest(data['h'], _otp_digest(data['n'], str(provided_otp))):
+        if record_failed_otp(f"challenge:{data['n']}"):
+            _consume(data['n'])
+        return None
+    
+    if not _consume(data['n']):
+        return None
+    
+    return data['u']
+
+def reissue_login_challenge(challenge):
+    """Replace a valid challenge with a fresh OTP; returns (user_id, otp, challenge) or None"""
+    data = _load(challenge)
+    if not data or not _consume(data['n']):
+        return None
+    
+    otp, new_challenge = issue_login_challenge(data['u'])
+    return data['u'], otp, new_challenge
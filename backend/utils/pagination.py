@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import Select, tuple_
+from db import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(created_at, row_id):
+    """Encode the (created_at, id) position of the last row into an opaque cursor"""
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into (created_at, id)"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def get_page_args(args):
+    """Read limit/cursor from the query string.
+
+    Returns None when neither parameter is given so callers can keep
+    returning the full list to clients that don't paginate.
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    
+    if limit is None and cursor is None:
+        return None
+    
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid limit')
+        if limit <= 0:
+            raise ValueError('Limit must be greater than 0')
+        limit = min(limit, MAX_PAGE_SIZE)
+    
+    return limit, decode_cursor(cursor) if cursor else None
+
+def keyset_page_query(query, model, limit, cursor=None, descending=True):
+    """query narrowed to the page after cursor, ordered by (created_at, id), plus one extra row
+
+    The position is applied as a WHERE predicate instead of an OFFSET, so
+    every page costs one index range scan regardless of how deep it is.
+    """
+    key = tuple_(model.created_at, model.id)
+    
+    if cursor is not None:
+        query = query.filter(key < tuple_(*cursor) if descending else key > tuple_(*cursor))
+    
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    
+    # Fetch one extra row to find out whether another page exists
+    return query.limit(limit + 1)
+
+def paginate_keyset(query, model, limit, cursor=None, descending=True):
+    """Return one page of query ordered by (created_at, id) plus the next cursor.
+
+    query is an ORM query or a Core select() with created_at and id columns.
+    """
+    query = keyset_page_query(query, model, limit, cursor, descending)
+    # Core select() statements (see utils/loan_queries.py) yield rows, not instances
+    rows = db.session.execute(query).all() if isinstance(query, Select) else query.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    return rows, next_cursor
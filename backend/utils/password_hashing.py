@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from utils.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_REJECTED
+
+# werkzeug method string; cost parameters are part of it (e.g. pbkdf2:sha256:600000)
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+# Hashes computed in parallel per process
+DEFAULT_HASH_WORKERS = 2
+# Hash requests allowed to wait for a worker before new ones are refused
+DEFAULT_HASH_MAX_PENDING = 16
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hashes are already queued in this process"""
+
+class PasswordHasher:
+    """Runs password hashing on a small bounded thread pool
+
+    scrypt and pbkdf2 release the GIL, so while a hash runs on the pool the
+    worker's other threads keep serving requests. At most max_workers hashes
+    burn CPU at once per process, and once max_pending callers are waiting
+    further ones fail fast with PasswordHashingBusy instead of piling up
+    behind a login burst.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, max_workers=DEFAULT_HASH_WORKERS,
+                 max_pending=DEFAULT_HASH_MAX_PENDING):
+        self.method = method
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._current_prefix = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Pool threads don't survive a fork; each worker builds its own
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, operation, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHashingBusy('Too many password hashes in progress')
+
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        started = time.perf_counter()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+            PASSWORD_HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash password with the configured method"""
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check password against a stored hash of any supported method"""
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with a different method or cost than configured"""
+        if self._current_prefix is None:
+            # werkzeug fills in defaults (e.g. 'pbkdf2' -> 'pbkdf2:sha256:600000'), so
+            # learn the full prefix from one throwaway hash per process
+            self._current_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._current_prefix
+
+def get_password_hasher():
+    """Return the current app's password hasher, creating it on first use"""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        hasher = PasswordHasher(
+            method=current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+            max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', DEFAULT_HASH_WORKERS),
+            max_pending=current_app.config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_HASH_MAX_PENDING)
+        )
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
@@ -0,0 +1,111 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements of the same shape run this many times in one request are flagged
+# as a likely N+1 (a lazy load or per-row query inside a loop)
+N_PLUS_ONE_THRESHOLD = 5
+
+# Placeholder styles of the drivers we run on: sqlite (?), PyMySQL/psycopg2
+# (%s, %(name)s) and SQLAlchemy's own (:name)
+_PARAM = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_PARAM_LIST = re.compile(r'\(\s*' + _PARAM + r'(?:\s*,\s*' + _PARAM + r')*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+def statement_shape(statement):
+    """SQL with parameter lists, numbers and whitespace collapsed
+
+    Two statements with the same shape differ only in their parameters,
+    e.g. the same lazy load issued for different rows.
+    """
+    shape = _PARAM_LIST.sub('(?)', statement)
+    shape = _NUMBER.sub('N', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+class QueryStats:
+    """SQL statements issued during one request or tracked block"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements.append(statement)
+
+    @property
+    def shapes(self):
+        """Counter of statement shapes; computed on demand so recording stays cheap"""
+        return Counter(statement_shape(statement) for statement in self.statements)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """{shape: times run} for shapes run at least threshold times"""
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+    def report(self):
+        """Statements run, most frequent shape first, for assertion messages"""
+        return '\n'.join(f'{count}x {shape}' for shape, count in self.shapes.most_common())
+
+# QueryStats of the active track_queries() blocks
+_trackers = []
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('_query_started', None)
+    duration = time.perf_counter() - started if started is not None else 0.0
+    if has_request_context() and '_query_stats' in g:
+        g._query_stats.record(statement, duration)
+    for stats in _trackers:
+        stats.record(statement, duration)
+
+def current_query_stats():
+    """QueryStats of the current request, or None outside one"""
+    if has_request_context():
+        return g.get('_query_stats')
+    return None
+
+@contextmanager
+def track_queries():
+    """Collect QueryStats for every statement run inside the block, on any engine"""
+    stats = QueryStats()
+    _trackers.append(stats)
+    try:
+        yield stats
+    finally:
+        _trackers.remove(stats)
+
+def init_query_counter(app):
+    """Count SQL statements and time per request
+
+    With app.debug or QUERY_STATS_HEADERS set, responses carry X-Query-Count,
+    X-Query-Time-Ms and X-Query-Repeated (number of likely N+1 shapes), and
+    each likely N+1 is printed with the endpoint that ran it.
+    """
+
+    @app.before_request
+    def start_query_stats():
+        g._query_stats = QueryStats()
+
+    @app.after_request
+    def add_query_stats_headers(response):
+        stats = current_query_stats()
+        if stats is None or not (app.debug or app.config.get('QUERY_STATS_HEADERS')):
+            return response
+        repeated = stats.repeated()
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers['X-Query-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+        response.headers['X-Query-Repeated'] = str(len(repeated))
+        for shape, count in repeated.items():
+            print(f"Likely N+1 in {request.method} {request.path}: {count}x {shape}")
+        return response
@@ -0,0 +1,145 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, request
+from models import normalize_email
+from utils.metrics import RATE_LIMITED
+from utils.ttl_store import redis_client
+
+# Buckets kept per process before the least recently used are evicted
+DEFAULT_MAX_KEYS = 100000
+
+class InMemoryRateLimiter:
+    """Process-local token buckets, one (tokens, timestamp) pair per key
+
+    Only limits the worker it runs in; use RedisRateLimiter (REDIS_URL) for
+    limits that hold across gunicorn workers and nodes.
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, period):
+        """Take one token from key's bucket; returns 0 if allowed, else seconds until a token frees up"""
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            # Evict the longest-idle bucket; idle buckets have refilled anyway
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+# Same algorithm as InMemoryRateLimiter.hit, run atomically inside Redis on
+# Redis' own clock so every worker and node shares one bucket per key
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period_ms = tonumber(ARGV[2])
+local rate = capacity / period_ms
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_ms = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], period_ms)
+return tostring(retry_ms)
+"""
+
+class RedisRateLimiter:
+    """Token buckets shared by every process pointed at the same Redis"""
+
+    def __init__(self, url, namespace='rate-limit'):
+        self.client = redis_client(url)
+        self.namespace = namespace
+        self._script = self.client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    def hit(self, key, capacity, period):
+        """Take one token from key's bucket; returns 0 if allowed, else seconds until a token frees up"""
+        retry_ms = self._script(keys=[f"{self.namespace}:{key}"], args=[capacity, int(period * 1000)])
+        return float(retry_ms) / 1000
+
+def get_rate_limiter():
+    """Return the app's rate limiter (Redis if REDIS_URL is set)"""
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None:
+        redis_url = current_app.config.get('REDIS_URL')
+        limiter = RedisRateLimiter(redis_url) if redis_url else InMemoryRateLimiter()
+        current_app.extensions['rate_limiter'] = limiter
+    return limiter
+
+def _limit_key(kind):
+    """Value identifying the caller for kind: 'ip' or a field of the JSON body"""
+    if kind == 'ip':
+        return request.remote_addr or 'unknown'
+    data = request.get_json(silent=True)
+    value = data.get(kind) if isinstance(data, dict) else None
+    if not isinstance(value, (str, int)) or isinstance(value, bool) or value == '':
+        return None
+    if kind == 'email':
+        return normalize_email(value)
+    return str(value).strip().lower()
+
+def rate_limit(scope, **limits):
+    """Decorator: token-bucket limits for the endpoint, checked before the view runs
+
+    Each keyword maps a key kind ('ip', or a JSON body field such as
+    'username' or 'email') to (capacity, period_seconds): up to capacity
+    requests in a burst, refilled evenly over period. A request is refused
+    with 429 if any of its buckets is empty, so refused requests never reach
+    the database or SMTP.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS' or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return fn(*args, **kwargs)
+
+            try:
+                limiter = get_rate_limiter()
+            except Exception as e:
+                # A limiter that can't even be built (e.g. Redis client missing)
+                # shouldn't take logins down with it either
+                print(f"Rate limiter unavailable for {scope}: {e}")
+                return fn(*args, **kwargs)
+
+            retry_after = 0
+            for kind, (capacity, period) in limits.items():
+                value = _limit_key(kind)
+                if value is None:
+                    continue
+                try:
+                    wait = limiter.hit(f"{scope}:{kind}:{value}", capacity, period)
+                except Exception as e:
+                    # A limiter outage shouldn't take logins down with it
+                    print(f"Rate limiter error for {scope}: {e}")
+                    continue
+                if wait:
+                    RATE_LIMITED.labels(scope, kind).inc()
+                    retry_after = max(retry_after, wait)
+
+            if retry_after:
+                response = jsonify({'error': 'Too many requests. Please try again later.'})
+                response.headers['Retry-After'] = str(math.ceil(retry_after))
+                return response, 429
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,89 @@
+import random
+from functools import wraps
+from flask import current_app, has_app_context, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.dml import UpdateBase
+from utils.db_pool import InstrumentedQueuePool, engine_options
+from utils.ttl_store import get_ttl_store
+
+# How long a user's reads stay on the primary after they commit a write.
+# Must cover the replicas' usual replication lag.
+DEFAULT_STICKY_SECONDS = 10
+
+_STICKY_STORE = 'replica-sticky-users'
+
+class RoutingSession(Session):
+    """Session that sends a replica_read handler's reads to a read replica
+
+    Everything else goes to the primary: flushes, INSERT/UPDATE/DELETE,
+    SELECT ... FOR UPDATE, and any read after the transaction has written.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or _is_write(clause):
+                self.info['wrote'] = True
+            elif 'read_replica' in self.info and not self.info.get('wrote'):
+                return self.info['read_replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _is_write(clause):
+    return isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_writer_to_primary(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        user_id = _request_user_id()
+        if user_id is not None and current_app.extensions.get('read_replicas'):
+            get_ttl_store(_STICKY_STORE).touch(
+                user_id, current_app.config.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+            )
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('wrote', None)
+
+def _request_user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # No verified JWT in this request (login, registration, ...)
+        return None
+
+def init_read_replicas(app, db, replica_urls):
+    """Create an engine per replica URL; replica_read handlers use them when any are set"""
+    replicas = {}
+    for i, url in enumerate(replica_urls):
+        engine = create_engine(url, **engine_options(url))
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics_name = f'replica{i}'
+        replicas[f'replica{i}'] = engine
+    app.extensions['read_replicas'] = replicas
+
+    @app.teardown_request
+    def release_read_replica(exc):
+        # After the response is sent, so streamed responses read from the replica too
+        if has_app_context():
+            db.session.info.pop('read_replica', None)
+
+def replica_read(fn):
+    """Decorator: run a read-only handler's queries on a read replica
+
+    Goes below the auth decorator, so token checks still read the primary.
+    Users who committed a write in the last REPLICA_STICKY_SECONDS read the
+    primary, so they always see their own writes. Without replicas
+    configured this does nothing.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get('read_replicas')
+        if replicas:
+            user_id = _request_user_id()
+            if user_id is None or not get_ttl_store(_STICKY_STORE).contains(user_id):
+                # One replica per request, so all its reads see the same snapshot
+                session = current_app.extensions['sqlalchemy'].session
+                session.info['read_replica'] = random.choice(list(replicas.values()))
+        return fn(*args, **kwargs)
+    return wrapper
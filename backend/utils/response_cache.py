@@ -0,0 +1,117 @@
+import random
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from db import db
+from models import CacheVersion
+from utils.ttl_store import redis_client
+
+# Serialized GET /api/admin/loans/pending payloads
+PENDING_LOANS_CACHE = 'pending_loans'
+
+# Entries kept per worker, and how long a shared (Redis) entry lives
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 300
+
+# Payloads are keyed by the version row in the database, which every write
+# covering them bumps right after it commits. A worker that reads the version
+# after the bump can never be served a payload built before the write,
+# whichever worker (or node) built it, so no cross-process invalidation is
+# needed.
+#
+# The bump runs in its own short transaction rather than the writer's: loan
+# creation, decisions, auto-reject and profile completion all bump this one
+# row, and holding its lock until each of them commits would serialize every
+# loan write. The price is a short window between the commit and the bump in
+# which readers may still be served the old payload; the first read after
+# the bump misses and rebuilds.
+
+_PENDING_BUMPS = 'cache_version_bumps'
+
+def get_cache_version(name):
+    """Current version of the named cache, or None if it has never been bumped"""
+    return db.session.query(CacheVersion.version).filter_by(name=name).scalar()
+
+def bump_cache_version(name):
+    """Invalidate the named cache once the current transaction commits (caller commits)
+
+    Nothing is bumped if the transaction rolls back.
+    """
+    db.session.info.setdefault(_PENDING_BUMPS, set()).add(name)
+
+def _bump_now(name):
+    increment = update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+    with db.engine.begin() as connection:
+        if connection.execute(increment).rowcount:
+            return
+
+        # First bump: start from a random version so payloads cached against a
+        # since-recreated table (or another database sharing Redis) never match
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(CacheVersion).values(name=name, version=random.randrange(1, 2 ** 62)))
+        except IntegrityError:
+            # Another transaction created the row first
+            connection.execute(increment)
+
+@event.listens_for(Session, 'after_commit')
+def _apply_cache_version_bumps(session):
+    for name in sorted(session.info.pop(_PENDING_BUMPS, ())):
+        try:
+            _bump_now(name)
+        except Exception as e:
+            # The write itself is committed; the cache catches up on the next bump
+            print(f"Could not bump cache version {name}: {e}")
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cache_version_bumps(session):
+    session.info.pop(_PENDING_BUMPS, None)
+
+class InMemoryLRUCache:
+    """Process-local LRU of serialized payloads"""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+class RedisCache:
+    """Payload cache shared by every process pointed at the same Redis"""
+
+    def __init__(self, url, namespace, ttl=RESPONSE_CACHE_TTL):
+        self.client = redis_client(url)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(f"{self.namespace}:{key}")
+
+    def set(self, key, value):
+        self.client.set(f"{self.namespace}:{key}", value, ex=self.ttl)
+
+def get_response_cache(namespace):
+    """Return the app's payload cache for namespace (Redis if REDIS_URL is set)"""
+    caches = current_app.extensions.setdefault('response_caches', {})
+    cache = caches.get(namespace)
+    if cache is None:
+        redis_url = current_app.config.get('REDIS_URL')
+        cache = RedisCache(redis_url, f"response-cache:{namespace}") if redis_url else InMemoryLRUCache()
+        caches[namespace] = cache
+    return cache
@@ -0,0 +1,120 @@
+import threading
+import time
+from flask import current_app
+
+class InMemoryTTLStore:
+    """Process-local set of keys that expire after a TTL
+
+    Only visible to the worker that wrote it; use RedisTTLStore (REDIS_URL)
+    when the guarantee has to hold across gunicorn workers and nodes.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._expires = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        expired = [key for key, expires_at in self._expires.items() if expires_at <= now]
+        for key in expired:
+            del self._expires[key]
+            self._counts.pop(key, None)
+
+    def add(self, key, ttl):
+        """Add key for ttl seconds; returns False if it was already present"""
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._expires.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            if len(self._expires) >= self.max_size:
+                self._purge(now)
+            self._expires[key] = now + ttl
+            return True
+
+    def touch(self, key, ttl):
+        """Add key for ttl seconds, extending it if already present"""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._expires) >= self.max_size:
+                self._purge(now)
+            self._expires[key] = now + ttl
+
+    def incr(self, key, ttl):
+        """Add 1 to key's counter and return it; the counter expires ttl seconds after its first increment"""
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._expires.get(key)
+            if expires_at is None or expires_at <= now:
+                if len(self._expires) >= self.max_size:
+                    self._purge(now)
+                self._expires[key] = now + ttl
+                self._counts[key] = 0
+            self._counts[key] = self._counts.get(key, 0) + 1
+            return self._counts[key]
+
+    def contains(self, key):
+        """True if key was added and hasn't expired"""
+        expires_at = self._expires.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+class RedisTTLStore:
+    """TTL set shared by every process pointed at the same Redis"""
+
+    def __init__(self, url, namespace):
+        self.client = redis_client(url)
+        self.namespace = namespace
+
+    def add(self, key, ttl):
+        """Add key for ttl seconds; returns False if it was already present"""
+        return bool(self.client.set(f"{self.namespace}:{key}", 1, nx=True, ex=int(ttl)))
+
+    def touch(self, key, ttl):
+        """Add key for ttl seconds, extending it if already present"""
+        self.client.set(f"{self.namespace}:{key}", 1, px=int(ttl * 1000))
+
+    def incr(self, key, ttl):
+        """Add 1 to key's counter and return it; the counter expires ttl seconds after its first increment"""
+        name = f"{self.namespace}:{key}"
+        count = self.client.incr(name)
+        if count == 1:
+            self.client.expire(name, int(ttl))
+        return count
+
+    def contains(self, key):
+        """True if key was added and hasn't expired"""
+        return bool(self.client.exists(f"{self.namespace}:{key}"))
+
+# Seconds to wait for Redis to connect or answer. Kept short so an
+# unreachable Redis fails the call (rate limits then fail open) instead of
+# hanging the request; override with REDIS_SOCKET_TIMEOUT.
+DEFAULT_REDIS_TIMEOUT = 0.25
+
+def redis_client(url):
+    """Redis client for url with short connect and read timeouts"""
+    import redis  # Optional dependency, only needed when REDIS_URL is set
+    timeout = current_app.config.get('REDIS_SOCKET_TIMEOUT', DEFAULT_REDIS_TIMEOUT)
+    return redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+def check_redis_client(redis_url):
+    """Fail at startup, not on the first request, if REDIS_URL is set without the redis package"""
+    if not redis_url:
+        return
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        raise RuntimeError(
+            "REDIS_URL is set but the 'redis' package is not installed; "
+            "run pip install -r requirements.txt or unset REDIS_URL"
+        ) from None
+
+def get_ttl_store(namespace):
+    """Return the app's TTL store for namespace (Redis if REDIS_URL is set)"""
+    stores = current_app.extensions.setdefault('ttl_stores', {})
+    store = stores.get(namespace)
+    if store is None:
+        redis_url = current_app.config.get('REDIS_URL')
+        store = RedisTTLStore(redis_url, namespace) if redis_url else InMemoryTTLStore()
+        stores[namespace] = store
+    return store